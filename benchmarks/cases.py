@@ -0,0 +1,130 @@
+"""
+Benchmark cases
+
+A case is a name and a function running one unit of work. Micro cases are timed over many calls,
+macro cases (searches) return the number of nodes or playouts they ran, and their rate is per node.
+Positions are random games of a seeded generator, so every run benchmarks the same positions.
+"""
+import random
+from state import Board, BitBoard
+from player import MCTS, AlphaZero, CuttingOffSearchPlayer
+from utils import evaluation
+
+BOARDS = {"Board": Board, "BitBoard": BitBoard}
+EVALUATION_FUNCS = ["dummy_evaluation_func", "distance_evaluation_func", "detailed_evaluation_func"]
+
+
+def random_position(board_name, size, fill, seed=0, n_in_row=5, **kwargs):
+    """
+    A position of a size x size board with fill * size * size pieces played at random,
+    skipping the moves ending the game. The other keyword arguments are passed to the board.
+    """
+    rng = random.Random(seed)
+    state = BOARDS[board_name](width=size, height=size, n_in_row=n_in_row, **kwargs)
+    state.reset()
+    n_moves = 0
+    while n_moves < int(fill * size * size):
+        state.perform_action(rng.choice(state.get_all_actions()))
+        if state.game_end()[0]:
+            state.cancel_action()
+        else:
+            n_moves += 1
+    return state
+
+
+def _cycle(state, seed=0):
+    """A function returning the actions of state in a seeded random order, one per call, endlessly"""
+    actions = list(state.get_all_actions())
+    random.Random(seed).shuffle(actions)
+    i = [0]
+
+    def next_action():
+        i[0] = (i[0] + 1) % len(actions)
+        return actions[i[0]]
+    return next_action
+
+
+def micro_cases(board_name, size, fill, seed=0):
+    """
+    The micro cases of the state and the evaluation functions on one position. The winner and the info
+    of a state are cached between two actions, so they are timed after performing one of a sequence
+    of actions (and cancelling it), together with the full scans they replace.
+    """
+    state = random_position(board_name, size, fill, seed)
+    next_action = _cycle(state, seed)
+    prefix = "{}/{}x{}/fill{:g}/".format(board_name, size, size, fill)
+
+    def perform_cancel():
+        state.perform_action(next_action())
+        state.cancel_action()
+
+    def perform_then(func, s, next_s_action):
+        def run():
+            s.perform_action(next_s_action())
+            func()
+            s.cancel_action()
+        return run
+
+    def evaluate(func):
+        def run():
+            state.perform_action(next_action())
+            func(state)
+            state.cancel_action()
+        return run
+
+    def evaluate_batch(func, states):
+        return lambda: func(states)
+
+    cases = [
+        ("perform_cancel", perform_cancel),
+        ("perform_has_a_winner_cancel", perform_then(state.has_a_winner, state, next_action)),
+        ("perform_game_end_cancel", perform_then(state.game_end, state, next_action)),
+        ("perform_get_info_cancel", perform_then(state.get_info, state, next_action)),
+        ("perform_compute_info_cancel", perform_then(state.compute_info, state, next_action)),
+    ]
+    if board_name == "Board":
+        # the scan of every piece for a winner, instead of the lines through the last action
+        scan_state = random_position(board_name, size, fill, seed, incremental_win=False)
+        cases.append(("perform_has_a_winner_full_scan_cancel",
+                      perform_then(scan_state.has_a_winner, scan_state, _cycle(scan_state, seed))))
+    # the batch functions evaluate the positions after each action of a batch of 64
+    children = []
+    for _ in range(64):
+        child = state.clone()
+        child.perform_action(next_action())
+        children.append(child)
+    for name in EVALUATION_FUNCS:
+        cases.append((name, evaluate(evaluation.get_evaluation_func(name))))
+        cases.append((name + "_batch64", evaluate_batch(evaluation.get_evaluation_func_batch(name), children)))
+    return [(prefix + name, func) for name, func in cases]
+
+
+def macro_cases(board_name, size, fill, seed=0, n_playout=500, max_depth=1):
+    """
+    The search cases on one position: MCTS and AlphaZero playouts and cutting off alpha-beta nodes
+    at a fixed depth (in moves of both players, as max_depth of CuttingOffSearchPlayer).
+    """
+    state = random_position(board_name, size, fill, seed)
+    prefix = "{}/{}x{}/fill{:g}/".format(board_name, size, size, fill)
+    evaluation_func = evaluation.detailed_evaluation_func
+
+    def mcts():
+        random.seed(seed)
+        return MCTS(state, 5, n_playout).search(state, n_playout)
+
+    def alphazero():
+        random.seed(seed)
+        return AlphaZero(state, evaluation_func, 5, n_playout, True).search(state, n_playout)
+
+    def alpha_beta():
+        player = CuttingOffSearchPlayer(max_depth, evaluation_func, use_candidates=True)
+        player.set_player(state.get_current_player())
+        player.get_action(state)
+        return player.stats["nodes"]
+
+    cases = [
+        ("mcts_playouts", mcts),
+        ("alphazero_playouts", alphazero),
+        ("alpha_beta_nodes_depth{}".format(max_depth), alpha_beta),
+    ]
+    return [(prefix + name, func) for name, func in cases]
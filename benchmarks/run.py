@@ -0,0 +1,128 @@
+"""
+Run the benchmarks, write the results to JSON and compare them with a baseline.
+No baseline is committed, as the rates depend on the machine: save one from a run of the reference tree,
+then compare the runs of a change with it on the same machine.
+
+    python3 benchmarks/run.py --output baseline.json
+    python3 benchmarks/run.py --output results.json --baseline baseline.json
+
+Every result is a rate (calls, playouts or nodes per second), a result below (1 - threshold) times its
+baseline is a regression, and the exit status is 1 if there is any.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+from cases import micro_cases, macro_cases
+
+
+def measure(func, min_time=0.1, repeat=3):
+    """Calls of func per second, the best of repeat runs of at least min_time seconds"""
+    def run(n):
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        return time.perf_counter() - start
+    n = 1
+    elapsed = run(n)
+    while elapsed < min_time / 10:
+        n *= 10
+        elapsed = run(n)
+    n = max(n, int(n * min_time / elapsed))
+    return n / min(run(n) for _ in range(repeat))
+
+
+def measure_search(func, repeat=3):
+    """Nodes (or playouts) per second of func, which returns the number it searched, the best of repeat runs"""
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = func()
+        rates.append(n / (time.perf_counter() - start))
+    return max(rates)
+
+
+def run(args):
+    results = {}
+    for board_name in args.boards:
+        for size in args.sizes:
+            for fill in args.fills:
+                cases = []
+                if not args.macro_only:
+                    cases += [(name, func, measure) for name, func in micro_cases(board_name, size, fill, args.seed)]
+                if not args.micro_only:
+                    cases += [(name, func, measure_search) for name, func in
+                              macro_cases(board_name, size, fill, args.seed, args.n_playout, args.max_depth)]
+                for name, func, measure_func in cases:
+                    if args.filter and not any(f in name for f in args.filter):
+                        continue
+                    results[name] = measure_func(func, repeat=args.repeat)
+                    print("{:<70}{:>14.1f} /s".format(name, results[name]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the ratio of every result to its baseline.
+
+    Return:
+        The names of the regressions, the results below (1 - threshold) times their baseline.
+    """
+    regressions = []
+    print()
+    print("{:<70}{:>14}{:>14}{:>8}".format("case", "baseline /s", "result /s", "ratio"))
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        ratio = value / baseline[name]
+        flag = ""
+        if ratio < 1 - threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("{:<70}{:>14.1f}{:>14.1f}{:>8.2f}{}".format(name, baseline[name], value, ratio, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boards", type=str, nargs="+", default=["Board", "BitBoard"], help="Implementations of the board state.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[9, 15, 19], help="Widths (and heights) of the boards.")
+    parser.add_argument("--fills", type=float, nargs="+", default=[0.1, 0.3, 0.5], help="Fractions of the board covered by pieces.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the positions and the searches.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each case, the best one is kept.")
+    parser.add_argument("--n_playout", type=int, default=500, help="Number of playouts of the MCTS/AlphaZero cases.")
+    parser.add_argument("--max_depth", type=int, default=1, help="Depth of the alpha-beta case, in moves of both players.")
+    parser.add_argument("--micro_only", action="store_true", help="Only run the cases of the state and the evaluation functions.")
+    parser.add_argument("--macro_only", action="store_true", help="Only run the search cases.")
+    parser.add_argument("--filter", type=str, nargs="+", default=None, help="Only run the cases whose name contains one of these strings.")
+    parser.add_argument("--output", type=str, default=None, help="JSON file to write the results to.")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON file of results to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown from the baseline reported as a regression.")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.platform(),
+                "args": vars(args),
+                "results": results,
+            }, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        print()
+        print("{} regression(s) beyond {:.0%}".format(len(regressions), args.threshold))
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,26 @@
+from __future__ import print_function
+
+from play import get_board, get_parser, get_player, parse_args
+from search import OpeningBook, build_opening_book
+
+
+def build(args):
+    board = get_board(args.board, width=args.width, height=args.height, n_in_row=args.n_in_row,
+                      candidate_distance=args.candidate_distance)
+    board.reset()
+    player_1 = get_player(args.player_1, args)
+    player_2 = get_player(args.player_2, args)
+    entries = build_opening_book(player_1, player_2, board, args.book_plies, args.book_replies, args.seed)
+    player_1.close()
+    player_2.close()
+    OpeningBook.write(args.output, entries, args.width, args.height, args.n_in_row)
+    print("{} positions written to {}".format(len(entries), args.output))
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    parser.add_argument("--output", type=str, required=True, help="Opening book file to write.")
+    parser.add_argument("--book_plies", type=int, default=4, help="Number of plies covered by the book.")
+    parser.add_argument("--book_replies", type=int, default=3, help="Number of moves followed from each position.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the choice of the followed moves.")
+    build(parse_args(parser))
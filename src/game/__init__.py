@@ -1,3 +1,7 @@
 from .game import *
 from .cligame import *
-from .guigame import *
+try:
+    from .guigame import *
+except ImportError:
+    # the GUI needs pygame, the headless games do not
+    pass
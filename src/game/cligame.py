@@ -1,3 +1,4 @@
+import time
 from state import Board
 from player import Player
 from .game import Game
@@ -42,12 +43,15 @@ class CLIGame(Game):
         player1.set_player(p1)
         player2.set_player(p2)
         players = {p1: player1, p2: player2}
+        self.moves, self.move_times, self.move_stats, self.move_visits = [], [], [], []
         if is_shown:
             self.graphic(self.board, player1.player, player2.player)
         while True:
             current_player = self.board.get_current_player()
             player_in_turn = players[current_player]
+            start = time.perf_counter()
             move = player_in_turn.get_action(self.board)
+            self.record_move(player_in_turn, move, time.perf_counter() - start)
             self.board.perform_action(move)
             if is_shown:
                 self.graphic(self.board, player1.player, player2.player)
@@ -5,12 +5,27 @@ class Game(object):
     def __init__(self, board: State, **kwargs):
         self.player = None
         self.board = board
+        # the moves of the last game, the seconds each of them took, the stats of the player making it
+        # and its root visits (see Player)
+        self.moves = []
+        self.move_times = []
+        self.move_stats = []
+        self.move_visits = []
+        # sink of the stats of the moves (see utils.telemetry.StatsWriter), None to drop them
+        self.stats_writer = None
 
     def graphic(self, board: State, player1, player2):
         raise NotImplementedError
 
     def start_play(self, player1: Player, player2: Player, start_player=0, is_shown=1):
         raise NotImplementedError
-    
-    
-    
\ No newline at end of file
+
+    def record_move(self, player: Player, move, seconds):
+        """Keep the move made by player and the seconds it took, and pass the stats of player to the stats writer."""
+        self.moves.append(move)
+        self.move_times.append(seconds)
+        self.move_stats.append(dict(player.stats))
+        self.move_visits.append(player.root_visits)
+        if self.stats_writer is not None:
+            self.stats_writer.write(dict(player.stats, ply=len(self.moves), player=str(player), move=move,
+                                         move_time=seconds))
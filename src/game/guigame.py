@@ -4,6 +4,7 @@ from .game import Game
 from player import Player
 from state import Board 
 import threading
+import time
 
 from os import environ
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
@@ -69,6 +70,7 @@ class GUIGame(Game):
                 raise Exception('start_player should be either 0 (player1 first) '
                                 'or 1 (player2 first)')
             self.board.reset(start_player)
+            self.moves, self.move_times, self.move_stats, self.move_visits = [], [], [], []
             p1, p2 = self.board._players
             player1.set_player(p1)
             player2.set_player(p2)
@@ -78,7 +80,9 @@ class GUIGame(Game):
             while True:
                 current_player = self.board.get_current_player()
                 player_in_turn = players[current_player]
+                start = time.perf_counter()
                 move = player_in_turn.get_action(self.board)
+                self.record_move(player_in_turn, move, time.perf_counter() - start)
                 # print(self.board.move_to_location(move))
                 self.board.perform_action(move)
                 if is_shown:
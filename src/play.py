@@ -2,7 +2,10 @@ from __future__ import print_function
 
 from game import *
 from player import *
-from utils.evaluation import get_evaluation_func
+from state import *
+from search import OpeningBook
+from utils.evaluation import get_evaluation_func, get_evaluation_func_batch
+from utils.telemetry import StatsWriter
 
 
 def get_player(player_name, args):
@@ -11,15 +14,19 @@ def get_player(player_name, args):
     elif player_name == "Human":
         return Human()
     elif player_name == "MinimaxSearchPlayer":
-        return MinimaxSearchPlayer()
+        return MinimaxSearchPlayer(args.candidates)
     elif player_name == "AlphaBetaSearchPlayer":
-        return AlphaBetaSearchPlayer()
+        return AlphaBetaSearchPlayer(args.tt_mb, args.candidates, not args.no_pvs)
     elif player_name == "CuttingOffSearchPlayer":
-        return CuttingOffSearchPlayer(args.max_depth, get_evaluation_func(args.evaluation_func))
+        return CuttingOffSearchPlayer(args.max_depth, get_evaluation_func(args.evaluation_func), args.tt_mb, args.candidates, not args.no_move_ordering, args.time_limit, args.threat_nodes,
+                                      not args.no_pvs)
     elif player_name == "MCTSPlayer":
-        return MCTSPlayer(args.c, args.n_playout)
+        return MCTSPlayer(args.c, args.n_playout, args.candidates, args.threat_nodes, not args.no_tree_reuse, args.workers, args.heuristic_rollout, args.rollouts_per_leaf,
+                          args.transpositions, args.symmetries, args.time_limit, not args.no_early_stop)
     elif player_name == "AlphaZeroPlayer":
-        return AlphaZeroPlayer(get_evaluation_func(args.evaluation_func), args.c, args.n_playout)
+        return AlphaZeroPlayer(get_evaluation_func(args.evaluation_func), args.c, args.n_playout, args.candidates, args.threat_nodes, not args.no_tree_reuse, args.workers,
+                               get_evaluation_func_batch(args.evaluation_func), args.batch_size, args.transpositions, args.symmetries,
+                               args.time_limit, not args.no_early_stop)
     elif player_name == "GUIHuman":
         assert hasattr(args, "game")
         assert isinstance(args.game, GUIGame)
@@ -28,36 +35,101 @@ def get_player(player_name, args):
         raise KeyError(player_name)
 
 
+def with_book(player, book):
+    """player playing the moves of book first, unless it is a human"""
+    return player if isinstance(player, (Human, GUIHuman)) else BookPlayer(player, book)
+
+
+def get_board(board_name, **kwargs):
+    if board_name == "Board":
+        return Board(**kwargs)
+    elif board_name == "BitBoard":
+        return BitBoard(**kwargs)
+    else:
+        raise KeyError(board_name)
+
+
 def run(args):
     n = args.n_in_row
     width, height = args.width, args.height
     try:
-        board = Board(width=width, height=height, n_in_row=n)
+        board = get_board(args.board, width=width, height=height, n_in_row=n, candidate_distance=args.candidate_distance)
         game = GUIGame(board, args.wav) if args.gui else CLIGame(board)
         args.game = game
         player_1 = get_player(args.player_1, args)
         player_2 = get_player(args.player_2, args)
+        if args.book is not None:
+            book = OpeningBook(args.book)
+            player_1, player_2 = with_book(player_1, book), with_book(player_2, book)
+        player_1.set_profiling(args.profile)
+        player_2.set_profiling(args.profile)
+        # a player only ponders against a human, as its thread would slow down the search of an engine
+        player_1.set_pondering(args.ponder and isinstance(player_2, (Human, GUIHuman)))
+        player_2.set_pondering(args.ponder and isinstance(player_1, (Human, GUIHuman)))
+        player_1.set_stats(not args.no_search_stats)
+        player_2.set_stats(not args.no_search_stats)
+        if args.stats or args.stats_file is not None:
+            game.stats_writer = StatsWriter(args.stats_file, echo=args.stats)
         # set start_player=0 for human first
         game.start_play(player_1, player_2, start_player=0, is_shown=1)
+        player_1.close()
+        player_2.close()
+        if game.stats_writer is not None:
+            game.stats_writer.close()
     except KeyboardInterrupt:
         print('\n\rquit')
 
 
-if __name__ == '__main__':
+def get_parser():
     import argparse
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--width", type=int, default=9, help="Width of board.")
     parser.add_argument("--height", type=int, default=9, help="Height of board.")
     parser.add_argument("--n_in_row", type=int, default=5, help="Number of pieces in a row to win.")
+    parser.add_argument("--board", type=str, default="Board", choices=["Board", "BitBoard"], help="Implementation of the board state.")
+    parser.add_argument("--candidates", action="store_true", help="Only search empty cells near the pieces (search players only).")
+    parser.add_argument("--candidate_distance", type=int, default=2, help="Maximum distance from a piece of the searched cells.")
     parser.add_argument("--player_1", type=str, default="DummyPlayer", help="Agent of Player 1")
     parser.add_argument("--player_2", type=str, default="DummyPlayer", help="Agent of Player 2")
     parser.add_argument("--gui", action="store_true", help="Whether to use GUI to play")
-    parser.add_argument("--max_depth", type=int, default=1, help="Maximum search depth (CuttingOffAlphaBetaSearch only).")
+    parser.add_argument("--max_depth", type=int, default=None, help="Maximum search depth, 1 by default and unlimited with --time_limit (CuttingOffAlphaBetaSearch only).")
+    parser.add_argument("--time_limit", type=float, default=None, help="Seconds per move: CuttingOffAlphaBetaSearch searches deeper one ply at a time until the time is up, MCTS/AlphaZero play the best action so far (within --n_playout playouts).")
+    parser.add_argument("--tt_mb", type=float, default=16, help="Memory cap of the transposition table in MB, 0 to disable it (AlphaBeta/CuttingOffAlphaBetaSearch only).")
+    parser.add_argument("--no_pvs", action="store_true", help="Plain alpha-beta instead of principal variation search (AlphaBetaSearchPlayer/CuttingOffAlphaBetaSearch only).")
+    parser.add_argument("--no_move_ordering", action="store_true", help="Search moves in board order (CuttingOffAlphaBetaSearch only).")
+    parser.add_argument("--threat_nodes", type=int, default=0, help="Node budget of the threat-space search run before the search, 0 to disable it (CuttingOffAlphaBetaSearch/MCTS/AlphaZero only).")
     parser.add_argument("--evaluation_func", type=str, default="dummy_evaluation_func", help="Evaluation function (CuttingOffAlphaBetaSearch/AlphaZero only).")
     parser.add_argument("--c", type=float, default=1, help="Trade-off hyperparameter (MCTS/AlphaZero only).")
-    parser.add_argument("--n_playout", type=int, default=5000, help="Number of playouts (MCTS/AlphaZero only).")
+    parser.add_argument("--n_playout", type=int, default=5000, help="Maximum number of playouts per move (MCTS/AlphaZero only).")
+    parser.add_argument("--no_early_stop", action="store_true", help="Run all the playouts even when the action is decided before (MCTS/AlphaZero only).")
+    parser.add_argument("--no_tree_reuse", action="store_true", help="Build a new tree every move instead of keeping the subtree of the last one (MCTS/AlphaZero only).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes searching independent trees (MCTS/AlphaZero only).")
+    parser.add_argument("--batch_size", type=int, default=1, help="Number of leaves evaluated together, using virtual loss (AlphaZero only).")
+    parser.add_argument("--heuristic_rollout", action="store_true", help="Win or block immediate wins in the random rollouts (MCTS only).")
+    parser.add_argument("--rollouts_per_leaf", type=int, default=1, help="Number of random games played in lockstep from each leaf (MCTS only).")
+    parser.add_argument("--transpositions", action="store_true", help="Share the nodes of the positions reached by different move orders (MCTS/AlphaZero only).")
+    parser.add_argument("--symmetries", action="store_true", help="Share the nodes of symmetric positions too, with --transpositions (MCTS/AlphaZero only).")
+    parser.add_argument("--stats", action="store_true", help="Print the search statistics of every move.")
+    parser.add_argument("--stats_file", type=str, default=None, help="JSONL file the search statistics of every move are appended to.")
+    parser.add_argument("--no_search_stats", action="store_true", help="Skip the counters of the searches (nodes, cutoffs, transposition table probes...), the statistics only keep the time and the values known without them.")
+    parser.add_argument("--profile", action="store_true", help="Time the evaluations of the searches, and the get_info calls within them, in the statistics (slightly slower).")
+    parser.add_argument("--ponder", action="store_true", help="Search on the opponent's time when it is a Human/GUIHuman (MCTS/alpha-beta players). The search runs in a background thread of the same process, competing with the other threads for the GIL, so it is refused between two engines and in tournament/selfplay, where it would slow down the search of the opponent.")
     parser.add_argument("--wav", type=str, default="./resource/chess_sound.wav", help="wav file of playing chess")
-    args = parser.parse_args()
+    parser.add_argument("--book", type=str, default=None, help="Opening book file consulted by the AI players before searching.")
+    return parser
+
+
+def parse_args(parser, argv=None, namespace=None):
+    args = parser.parse_args(argv, namespace)
+    if args.max_depth is None and args.time_limit is None:
+        args.max_depth = 1
+    return args
 
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parse_args(parser)
+    if args.ponder and not {args.player_1, args.player_2} & {"Human", "GUIHuman"}:
+        parser.error("--ponder needs a Human or GUIHuman opponent")
     run(args)
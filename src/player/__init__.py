@@ -1,5 +1,6 @@
 from .alpha_beta_search_player import * 
 from .alphazero_player import *
+from .book_player import *
 from .cutting_off_search_player import *
 from .dummy_player import *
 from .guihuman import *
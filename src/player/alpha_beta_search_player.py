@@ -1,69 +1,62 @@
-from typing import Tuple
-from copy import deepcopy
+import time
 from state import State
+from search import TranspositionTable, NegamaxSearch, SearchStopped
 from .player import Player
 
-inf = 10000
+
 class AlphaBetaSearchPlayer(Player):
     """
-    Player based on alpha-beta search.
+    Player based on alpha-beta search, to the end of the game.
     """
 
-    def get_action(self, state: State):
+    def __init__(self, tt_mb=16, use_candidates=False, pvs=True):
         """
-        An interface for recursively searching.
+        Parameters:
+            tt_mb: memory cap of the transposition table in megabytes, 0 to disable it.
+            use_candidates: only search the candidate actions of the state (empty cells near the pieces).
+            pvs: principal variation search rather than plain alpha-beta (see NegamaxSearch).
         """
-        assert state.get_current_player() == self.player
-
-        def alpha_beta_search(s: State, alpha, beta):
-            """
-            Based on minimax search, record current maximum value of the max player (alpha)
-            and current minimum value of the min player (beta), use alpha and beta to prune.
+        super().__init__()
+        self.tt = TranspositionTable(tt_mb) if tt_mb > 0 else None
+        self.use_candidates = use_candidates
+        self.engine = NegamaxSearch(tt=self.tt, use_candidates=use_candidates, pvs=pvs)
 
-            Parameters:
-                s: the current state
-                alpha: the current maximum value of the max player
-                beta: the current minimum value of the min player
+    def set_player(self, p):
+        super().set_player(p)
+        if self.tt is not None:
+            self.tt.clear()
 
-            Return:
-                Tuple(value, action): the node value and the best action (if exists)
-            
-            Note: before you perform an action, you might need to copy the original state for in-place update.
-            """
-            end, winner = s.game_end()
-            value, action = None, None
-            if end:
-                if winner == -1:
-                    value = 0
-                else:
-                    value = (1 if winner == self.player else -1)
-            else:
-                # TODO
-                flag =  self.player == s.get_current_player()
-                value = -inf if flag else inf  # MAX node / MIN node
-                state_copy = deepcopy(s)
-                for act_temp in s.get_all_actions():
-                    if flag:     # MAX node
-                        state_copy.perform_action(act_temp) 
-                        temp_value, _ = alpha_beta_search(state_copy, alpha, beta)
-                        state_copy.cancel_action()
-                        if temp_value > value:
-                            value = temp_value
-                            action = act_temp
-                        if value >= beta:
-                            return value, action
-                        alpha = max(alpha, value)
-                    else:        # MIN node
-                        state_copy.perform_action(act_temp) 
-                        temp_value, _ = alpha_beta_search(state_copy, alpha, beta)
-                        state_copy.cancel_action()
-                        if temp_value < value: 
-                            value = temp_value
-                            # action = act_temp
-                        if value <= alpha:
-                            return value, action
-                        beta = min(beta, value)
+    def set_stats(self, enabled):
+        super().set_stats(enabled)
+        self.engine.counting = enabled
+        if self.tt is not None:
+            self.tt.counting = enabled
 
-            return value, action
+    def get_action(self, state: State):
+        """
+        An interface for recursively searching.
+        """
+        self.stop_pondering()
+        assert state.get_current_player() == self.player
+        start = time.perf_counter()
+        self.engine.new_search()
+        _, line = self.engine.search(state.clone())
+        action = line[0] if line else None
+        self.stats = dict(self.engine.stats)
+        self.stats["time"] = time.perf_counter() - start
+        if self.tt is not None and self.counting:
+            self.stats["tt_probes"] = self.tt.probes
+            self.stats["tt_hits"] = self.tt.hits
+            self.stats["tt_hit_rate"] = self.tt.hit_rate()
+        self.start_pondering(state, action)
+        return action
 
-        return alpha_beta_search(state, -inf, inf)[1]
+    def ponder(self, state: State, stop):
+        """Solve the position after the move of the player into the transposition table, until stop is set."""
+        if self.tt is None:
+            return
+        self.engine.new_search()
+        try:
+            self.engine.search(state.clone(), stop=stop)
+        except SearchStopped:
+            pass
@@ -1,21 +1,32 @@
-import copy
+import numpy as np
 from state import State
-from .player import Player
-from .mcts_player import MCTS
+from .mcts_player import MCTS, MCTSPlayer, TranspositionMCTS
+
+# utility added to the nodes of a pending playout, making them look lost to the player choosing them
+VIRTUAL_LOSS = 1.0
 
 
 class AlphaZero(MCTS):
     """
     A modification based on pure MCTS, replacing randomly playout with using an evaluation function.
     """
-    def __init__(self, start_state: State, evaluation_func, c=5, n_playout=10000):
+    def __init__(self, start_state: State, evaluation_func, c=5, n_playout=10000, use_candidates=False,
+                 evaluation_func_batch=None, batch_size=1):
         """
         Parameters:
             evaluation_func: a function taking a state as input and
                 outputs the value in the current player's perspective.
+            evaluation_func_batch: the batch version of evaluation_func, taking a list of states and
+                outputting an array of their values (None to call evaluation_func on each state).
+            batch_size: number of leaves collected with virtual loss and evaluated together.
         """
-        super().__init__(start_state, c, n_playout)
+        super().__init__(start_state, c, n_playout, use_candidates)
         self.evaluation_func = evaluation_func
+        self.evaluation_func_batch = evaluation_func_batch
+        self.batch_size = batch_size
+        if batch_size > 1:
+            # the budgets are checked between full batches
+            self.playouts_per_check = batch_size
 
     def get_leaf_value(self, state: State):
         # TODO
@@ -25,20 +36,68 @@ class AlphaZero(MCTS):
         else:
             return self.evaluation_func(state)
 
+    def get_leaf_values(self, states):
+        """The values of get_leaf_value for a list of states, evaluating the non-terminal ones in one batch"""
+        values = np.zeros(len(states))
+        pending = []
+        for i, state in enumerate(states):
+            end, winner = state.game_end()
+            if end:
+                values[i] = 0 if winner == -1 else -1
+            else:
+                pending.append(i)
+        if pending:
+            if self.evaluation_func_batch is None:
+                values[pending] = [self.evaluation_func(states[i]) for i in pending]
+            else:
+                values[pending] = self.evaluation_func_batch([states[i] for i in pending])
+        return values
+
+    def playout_batch(self, states):
+        """
+        Run one playout for each of the states (copies of the root state). A virtual loss is put on the
+        nodes of each path until its leaf is evaluated, so that the next descents choose other paths.
+        All leaves are evaluated at once before their values are propagated back.
+        """
+        paths = []
+        for state in states:
+            path = self.descend(state)
+            self.n_visits[path] += 1
+            self.U[path[1:]] += VIRTUAL_LOSS
+            paths.append(path)
+        leaf_values = self.get_leaf_values(states)
+        for path, leaf_value in zip(paths, leaf_values):
+            self.n_visits[path] -= 1
+            self.U[path[1:]] -= VIRTUAL_LOSS
+            self.update(path, leaf_value)
+
+    def run_playouts(self, state: State, n_playout):
+        if self.batch_size <= 1:
+            return super().run_playouts(state, n_playout)
+        for n in range(0, n_playout, self.batch_size):
+            self.playout_batch([state.clone() for _ in range(min(self.batch_size, n_playout - n))])
+
 
+class TranspositionAlphaZero(TranspositionMCTS, AlphaZero):
+    """AlphaZero on a directed acyclic graph of positions, see TranspositionMCTS."""
 
-class AlphaZeroPlayer(Player):
+
+class AlphaZeroPlayer(MCTSPlayer):
     """AI player based on MCTS"""
-    def __init__(self, evaluation_func, c=5, n_playout=2000):
-        super().__init__()
+    def __init__(self, evaluation_func, c=5, n_playout=2000, use_candidates=False, threat_nodes=0, reuse_tree=True,
+                 workers=1, evaluation_func_batch=None, batch_size=1, transpositions=False, symmetries=False,
+                 time_limit=None, stop_when_decided=True):
+        super().__init__(c, n_playout, use_candidates, threat_nodes, reuse_tree, workers,
+                         transpositions=transpositions, symmetries=symmetries, time_limit=time_limit,
+                         stop_when_decided=stop_when_decided)
         self.evaluation_func = evaluation_func
-        self.c = c
-        self.n_playout = n_playout
-
-    def get_action(self, state: State):
-        mcts = AlphaZero(state, self.evaluation_func, self.c, self.n_playout)
-        for n in range(self.n_playout):
-            state_copy = copy.deepcopy(state)
-            mcts.playout(state_copy)
-        return max(mcts.root.children.items(),
-                   key=lambda act_node: act_node[1].n_visits)[0]
+        self.evaluation_func_batch = evaluation_func_batch
+        self.batch_size = batch_size
+
+    def new_tree(self, state: State):
+        if self.transpositions:
+            return TranspositionAlphaZero(state, self.evaluation_func, self.c_puct, self.n_playout,
+                                          self.use_candidates, self.evaluation_func_batch, self.batch_size,
+                                          symmetries=self.symmetries)
+        return AlphaZero(state, self.evaluation_func, self.c_puct, self.n_playout, self.use_candidates,
+                         self.evaluation_func_batch, self.batch_size)
@@ -0,0 +1,52 @@
+import time
+from state import State
+from search import OpeningBook
+from .player import Player
+
+
+class BookPlayer(Player):
+    """
+    Wrapper of a player, playing the move of an opening book when the position is in it
+    and asking the wrapped player otherwise.
+    """
+
+    def __init__(self, player: Player, book: OpeningBook):
+        super().__init__()
+        self.player_in_book = player
+        self.book = book
+
+    def set_player(self, p):
+        super().set_player(p)
+        self.player_in_book.set_player(p)
+
+    def set_stats(self, enabled):
+        super().set_stats(enabled)
+        self.player_in_book.set_stats(enabled)
+
+    def set_profiling(self, enabled):
+        super().set_profiling(enabled)
+        self.player_in_book.set_profiling(enabled)
+
+    def set_pondering(self, enabled):
+        # the wrapped player ponders after its own moves, not after the moves of the book
+        super().set_pondering(enabled)
+        self.player_in_book.set_pondering(enabled)
+
+    def close(self):
+        super().close()
+        self.player_in_book.close()
+
+    def get_action(self, state: State):
+        start = time.perf_counter()
+        action = self.book.lookup(state)
+        if action is not None and action in state.get_all_actions():
+            # the wrapped player was pondering on a position the book move leaves behind
+            self.player_in_book.stop_pondering()
+            self.stats = {"book": True, "time": time.perf_counter() - start}
+            return action
+        action = self.player_in_book.get_action(state)
+        self.stats = dict(self.player_in_book.stats, book=False)
+        return action
+
+    def __str__(self):
+        return f"{self.player_in_book} (with book)"
@@ -1,91 +1,111 @@
-from typing import Tuple
-from copy import deepcopy
+import time
 from state import State
+from search import TranspositionTable, MoveOrderer, NegamaxSearch
+from utils.telemetry import Profile
 from .player import Player
 
-inf = 10000
 
 class CuttingOffSearchPlayer(Player):
 
-    def __init__(self, max_depth, evaluation_func=None):
+    def __init__(self, max_depth, evaluation_func=None, tt_mb=16, use_candidates=False, move_ordering=True,
+                 time_limit=None, threat_nodes=0, pvs=True, aspiration_window=0.1):
         """
         Player based on cutting off alpha-beta search.
         Parameters:
-            max_depth: maximum searching depth. The search will stop when the depth exists max_depth.
+            max_depth: maximum searching depth in moves of both players (2 * max_depth plies).
+                The search will stop when the depth exists max_depth. May be None with a time limit.
             evaluation_func: a function taking a state as input and
                 outputs the value in the current player's perspective.
+            tt_mb: memory cap of the transposition table in megabytes, 0 to disable it.
+            use_candidates: only search the candidate actions of the state (empty cells near the pieces).
+            move_ordering: search the moves in the order of MoveOrderer rather than the order of the state.
+            time_limit: seconds per move for iterative deepening, None to search max_depth directly.
+            threat_nodes: node budget of the threat-space search run before the search, 0 to disable it.
+            pvs: principal variation search rather than plain alpha-beta (see NegamaxSearch).
+            aspiration_window: half width of the window around the value of the previous iteration
+                the iterations of iterative deepening are searched with, None for the full window.
         """
         super().__init__()
+        assert max_depth is not None or time_limit is not None
         self.max_depth = max_depth
+        self.time_limit = time_limit
         self.evaluation_func = (lambda s: 0) if evaluation_func is None else evaluation_func
+        self.tt = TranspositionTable(tt_mb) if tt_mb > 0 else None
+        self.use_candidates = use_candidates
+        self.orderer = MoveOrderer() if move_ordering else None
+        self.set_threat_search(threat_nodes)
+        self.aspiration_window = aspiration_window
+        self.engine = NegamaxSearch(self.evaluation_func, self.tt, self.orderer, use_candidates, pvs=pvs)
 
-    def evaluation(self, state: State):
-        """
-        Calculate the evaluation value relative to the agent player (rather than state's current player),
-        i.e., take negation if the current player is opponent or do nothing else wise.
-        """
-        value = self.evaluation_func(state)
-        if self.player != state.get_current_player():
-            value = -value
-        return value
+    def set_player(self, p):
+        super().set_player(p)
+        # every game starts with an empty table and history
+        if self.tt is not None:
+            self.tt.clear()
+        if self.orderer is not None:
+            self.orderer.clear()
 
     def get_action(self, state: State):
         """
         An interface for recursively searching.
+        Without a time limit, the search goes to max_depth directly. With a time limit, the search
+        deepens one ply at a time, starting each iteration with the best line of the previous one,
+        and returns the best action of the last completed iteration when the time is up.
         """
+        self.stop_pondering()
         assert state.get_current_player() == self.player
+        start = time.perf_counter()
+        action = self.get_threat_action(state)
+        if action is not None:
+            self.start_pondering(state, action)
+            return action
+        deadline = None if self.time_limit is None else start + self.time_limit
+        with Profile(self.engine, "evaluate", enabled=self.profiling) as profile, \
+                Profile(type(state), "get_info", enabled=self.profiling) as info_profile:
+            action, completed_depth, stats = self.search(state, deadline)
+        if action is None:
+            # not even one ply was completed in time
+            action = state.get_all_actions()[0]
+        self.stats.update(stats)
+        self.stats["depth"] = self.stats["max_depth"] = completed_depth
+        if self.profiling:
+            self.stats["evaluation_time"] = profile.time
+            self.stats["get_info_time"] = info_profile.time
+        self.stats["time"] = time.perf_counter() - start
+        if self.tt is not None and self.counting:
+            self.stats["tt_probes"] = self.tt.probes
+            self.stats["tt_hits"] = self.tt.hits
+            self.stats["tt_hit_rate"] = self.tt.hit_rate()
+        self.start_pondering(state, action)
+        return action
 
-        def cutting_off_alpha_beta_search(s: State, d, alpha, beta):
-            """
-            Search for several depth and use evaluation value as cutting off.
-
-            Parameters:
-                s: the current state
-                d: the remaining search depth, the search will stop when d=0
-                alpha: the current maximum value of the max player
-                beta: the current minimum value of the min player
+    def set_stats(self, enabled):
+        super().set_stats(enabled)
+        self.engine.counting = enabled
+        if self.tt is not None:
+            self.tt.counting = enabled
 
-            Return:
-                Tuple(value, action): the node value and the best action (if exists)
-            
-            Note: before you perform an action, you might need to copy the original state for in-place update.
-            """
-            end, winner = s.game_end()
-            value, action = None, None
-            if end:
-                if winner == -1:
-                    value = 0
-                else:
-                    value = (1 if winner == self.player else -1)
-            elif d == 0:
-                value = self.evaluation_func(s)
-            else:
-                # TODO
-                flag =  self.player == s.get_current_player()
-                value = -inf if flag else inf  # MAX node / MIN node
-                state_copy = deepcopy(s)
-                for act_temp in s.get_all_actions():
-                    if flag:     # MAX node
-                        state_copy.perform_action(act_temp) 
-                        temp_value, _ = cutting_off_alpha_beta_search(state_copy, d, alpha, beta)
-                        state_copy.cancel_action()
-                        if temp_value > value:
-                            value = temp_value
-                            action = act_temp
-                        if value >= beta:
-                            return value, action
-                        alpha = max(alpha, value)
-                    else:        # MIN node
-                        state_copy.perform_action(act_temp) 
-                        temp_value, _ = cutting_off_alpha_beta_search(state_copy, d - 1, alpha, beta)
-                        state_copy.cancel_action()
-                        if temp_value < value: 
-                            value = temp_value
-                            # action = act_temp
-                        if value <= alpha:
-                            return value, action
-                        beta = min(beta, value)
+    def ponder(self, state: State, stop):
+        """Deepen the search of the position after the move of the player, filling the transposition table."""
+        self.search(state, stop=stop)
 
-            return value, action
+    def search(self, state: State, deadline=None, stop=None):
+        """
+        Search state to 2 * max_depth plies, or deepen one ply at a time until deadline (a perf_counter time)
+        is passed or stop (a threading.Event) is set. When pondering, the search goes one ply deeper than
+        the next search of the player, which starts one ply below it.
 
-        return cutting_off_alpha_beta_search(state, self.max_depth, -inf, inf)[1]
+        Return:
+            Tuple(action, depth, stats): the best action of the deepest completed iteration (None if there is none),
+            its depth in plies and the counters of the search.
+        """
+        engine = self.engine
+        engine.new_search()
+        if deadline is None and stop is None:
+            depths = [2 * self.max_depth]
+        else:
+            # without max_depth, deepen until every empty cell is searched
+            max_plies = len(state.get_all_actions()) if self.max_depth is None else 2 * self.max_depth + (stop is not None)
+            depths = range(1, max_plies + 1)
+        action, completed_depth, _ = engine.iterative_deepening(state, depths, deadline, stop, self.aspiration_window)
+        return action, completed_depth, dict(engine.stats)
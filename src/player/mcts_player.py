@@ -1,150 +1,680 @@
 import random
+import time
+import multiprocessing
 
-import copy
 import numpy as np
 from state import State
+from search import RolloutEngine, canonical_key, get_symmetries
+from utils import evaluation
+from utils.telemetry import Profile
 from .player import Player
 
-from copy import deepcopy
 
+def _grow(array, capacity, size, dtype, fill):
+    """A new array of capacity entries, the first size of them copied from array (if any) and the others set to fill"""
+    new = np.full(capacity, fill, dtype=dtype)
+    if array is not None:
+        new[:size] = array[:size]
+    return new
 
-class TreeNode(object):
-    """A node in the MCTS tree. Each node keeps track of its total utility U, and its visit-count n_visit.
+
+class MCTS(object):
+    """
+    A simple implementation of Monte Carlo Tree Search.
+
+    The tree is stored as a structure of arrays, node i being described by the i-th entry of each array
+    (26 bytes per node). The children of a node are allocated together the first time it is expanded,
+    as one contiguous block of all its actions in random order, and are expanded one by one in that order.
     """
+    # number of playouts run between two checks of the budgets of search
+    playouts_per_check = 8
 
-    def __init__(self, parent, state: State):
+    def __init__(self, start_state: State, c=5, n_playout=10000, use_candidates=False, heuristic_rollout=False,
+                 rollouts_per_leaf=1):
         """
         Parameters:
-            parent (TreeNode | None): the parent node of the new node.
-            state (State): the state corresponding to the new node.
+            c: the hyperparameter in the UCB value.
+            n_playout: the number of total playouts.
+            use_candidates: only expand the candidate actions of the states (empty cells near the pieces).
+            heuristic_rollout: win or block immediate wins in the rollouts instead of playing uniformly random moves.
+            rollouts_per_leaf: number of games played (in lockstep) from each leaf, the leaf value is their average.
         """
-        self.parent = parent
-        self.actions = deepcopy(state.get_all_actions())  # a list of all actions
-        self.children = {}  # a map from action to TreeNode
-        self.n_visits = 0
-        self.U = 0  # total utility
+        self.start_state = start_state
+        self.c = c
+        self.n_playout = n_playout
+        self.use_candidates = use_candidates
+        self.rollout_engine = RolloutEngine(heuristic_rollout)
+        self.rollouts_per_leaf = rollouts_per_leaf
+        # the longest path of the playouts, in plies, only kept when counting
+        self.max_depth = 0
+        self.counting = True
+        self.size = 0
+        self._allocate(1024)
+        self.root = self._new_nodes(1)
+
+    def _allocate(self, capacity):
+        """Grow the arrays of the nodes to capacity entries"""
+        def grow(array, dtype, fill):
+            return _grow(array, capacity, self.size, dtype, fill)
+        self.n_visits = grow(getattr(self, "n_visits", None), np.int32, 0)
+        # total utility, in the perspective of the player to move at the node
+        self.U = grow(getattr(self, "U", None), np.float64, 0)
+        self.parent = grow(getattr(self, "parent", None), np.int32, -1)
+        # the action taken from the parent to the node
+        self.action = grow(getattr(self, "action", None), np.int16, -1)
+        # children of a node are the nodes first_child .. first_child + n_children - 1,
+        # the first n_expanded of them are expanded
+        self.first_child = grow(getattr(self, "first_child", None), np.int32, -1)
+        self.n_children = grow(getattr(self, "n_children", None), np.int16, 0)
+        self.n_expanded = grow(getattr(self, "n_expanded", None), np.int16, 0)
+        self.capacity = capacity
 
-    def expand(self, action, next_state):
+    def _new_nodes(self, n):
+        """Allocate n new nodes, returning the index of the first one"""
+        if self.size + n > self.capacity:
+            self._allocate(max(2 * self.capacity, self.size + n))
+        first = self.size
+        self.size += n
+        return first
+
+    def expand(self, node, state: State):
+        """
+        Allocate the children of node, one for each action of state (the state of the node), in random order.
         """
-        Expand tree by creating a new child.
+        actions = list(state.get_candidate_actions() if self.use_candidates else state.get_all_actions())
+        random.shuffle(actions)
+        first = self._new_nodes(len(actions))
+        self.parent[first:first + len(actions)] = node
+        self.action[first:first + len(actions)] = actions
+        self.first_child[node] = first
+        self.n_children[node] = len(actions)
 
-        Parameters:
-            action: the action taken to achieve the child.
-            next_state: the state corresponding to the child.
+    def select(self, node):
         """
-        # TODO
-        self.children[action] = TreeNode(self, next_state)
+        Select the child of an (entirely expanded) node with the maximum UCB value, a combination of
+        leaf evaluations U/N and the ``uncertainty'' from the number of visits of the child and node.
+        Note that U/N is in the child's perspective, so a negation is required.
 
-    def get_ucb(self, c):
-        """Calculate and return the ucb value for this node in the parent's perspective.
-        It is a combination of leaf evaluations U/N and the ``uncertainty'' from the number
-        of visits of this node and its parent.
-        Note that U/N is in this node's perspective, so a negation is required.
+        Return: the index of the child.
+        """
+        first = self.first_child[node]
+        last = first + self.n_children[node]
+        n_visits = self.n_visits[first:last]
+        ucb = -self.U[first:last] / n_visits + self.c * np.sqrt(np.log(self.n_visits[node]) / n_visits)
+        return first + int(ucb.argmax())
+
+    def update(self, path, leaf_value):
+        """
+        Update node values from leaf evaluation along the path from the root to the leaf.
 
         Parameters:
-            c: the trade-off hyperparameter.
+            path: indices of the nodes from the root to the leaf.
+            leaf_value: the value of subtree evaluation from the leaf's current player's perspective.
         """
-        # TODO
-        return -self.U / self.n_visits + c * np.sqrt(np.log(self.parent.n_visits) / self.n_visits)
+        path = np.array(path)
+        # values alternate in sign between a node and its parent
+        signs = np.where(np.arange(len(path)) % 2 == (len(path) - 1) % 2, 1., -1.)
+        self.U[path] += leaf_value * signs
+        self.n_visits[path] += 1
+        if self.counting:
+            self.max_depth = max(self.max_depth, len(path) - 1)
 
-    def select(self, c):
-        """Select action among children that gives maximum UCB value.
+    def descend(self, state: State):
+        """
+        Go down from the root to a leaf, expanding one new child unless a terminal state is reached first.
+        State is modified in-place to the state of the leaf.
 
-        Parameters:
-            c: the hyperparameter in the UCB value.
+        Return: the path of nodes from the root to the leaf.
+        """
+        node = self.root
+        path = [node]
+        while not state.game_end()[0]:
+            if self.first_child[node] < 0:
+                self.expand(node, state)
+            n_expanded = self.n_expanded[node]
+            if n_expanded < self.n_children[node]:
+                node = int(self.first_child[node]) + int(n_expanded)
+                self.n_expanded[path[-1]] = n_expanded + 1
+                state.perform_action(int(self.action[node]))
+                path.append(node)
+                break
+            else:
+                # Greedily select next move.
+                node = self.select(node)
+                state.perform_action(int(self.action[node]))
+                path.append(node)
+        return path
+
+    def playout(self, state: State):
+        """
+        Run a single playout from the root to the leaf, getting a value at
+        the leaf and propagating it back through its parents.
+        State is modified in-place to the state of the leaf, so a copy must be provided.
 
-        Return: A tuple of (action, next_node)
+        Return: the path of nodes from the root to the leaf.
         """
-        # TODO
-        return max(self.children.items(), key=lambda act_node: act_node[1].get_ucb(c))
+        path = self.descend(state)
+        leaf_value = self.get_leaf_value(state)
+        # Update value and visit count of nodes in this traversal.
+        self.update(path, leaf_value)
+        return path
 
-    def update(self, leaf_value):
+    def search(self, state: State, max_playouts=None, deadline=None, stop_when_decided=True):
         """
-        Update node values from leaf evaluation.
+        Run playouts from state, the state of the root, until max_playouts playouts are done or the deadline
+        is passed (at least playouts_per_check playouts are run). The search can be stopped at any time,
+        the most visited child of the root being the best action so far.
 
         Parameters:
-            leaf_value: the value of subtree evaluation from the current player's perspective.
+            max_playouts: the maximum number of playouts, None for no limit (with a deadline).
+            deadline: the time.perf_counter() time the search stops at, None for no limit.
+            stop_when_decided: with max_playouts, stop as soon as the most visited child of the root leads every
+                other child by more than the playouts left, so that the remaining playouts cannot change it.
+                With a deadline only, the playouts left are unknown and the search runs until the deadline.
+
+        Return: the number of playouts run.
         """
-        # TODO
-        self.U = self.U + leaf_value
-        self.n_visits += 1
+        assert max_playouts is not None or deadline is not None
+        stop_when_decided = stop_when_decided and max_playouts is not None
+        state = state.clone()
+        n = 0
+        while max_playouts is None or n < max_playouts:
+            k = self.playouts_per_check if max_playouts is None else min(self.playouts_per_check, max_playouts - n)
+            self.run_playouts(state, k)
+            n += k
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            # the deadline can only leave fewer playouts than max_playouts, so the bound holds with it too
+            if stop_when_decided and self.is_decided(max_playouts - n):
+                break
+        return n
 
-    def update_recursive(self, leaf_value):
-        """Like a call to update(), but applied recursively for all ancestors.
+    def run_playouts(self, state: State, n_playout):
         """
-        # If it is not root, this node's parent should be updated first.
-        if self.parent:
-            self.parent.update_recursive(-leaf_value)
-        self.update(leaf_value)
+        Run n_playout playouts from state, a copy of the state of the root, cancelling the actions
+        of each playout after it.
+        """
+        for _ in range(n_playout):
+            path = self.playout(state)
+            for _ in range(len(path) - 1):
+                state.cancel_action()
 
-    def get_unexpanded_actions(self):
-        return list(set(self.actions) - set(self.children.keys()))
+    def is_decided(self, playouts_left):
+        """Whether the most visited child of the root leads every other child by more than playouts_left visits"""
+        if self.n_children[self.root] == 1:
+            return True
+        _, n_visits = self.get_root_visits()
+        if len(n_visits) == 0:
+            return False
+        top = np.partition(n_visits, len(n_visits) - 2)[-2:] if len(n_visits) > 1 else [0, n_visits[0]]
+        return top[1] - top[0] > playouts_left
 
+    def get_leaf_value(self, state: State):
+        """
+        Randomly playout until the end of the game, returning +1 if the current
+        player wins, -1 if the opponent wins, and 0 if it is a tie.
+        With several rollouts per leaf, the average of their values is returned.
 
-class MCTS(object):
-    """A simple implementation of Monte Carlo Tree Search."""
+        Note: the value should be under the perspective of state.get_current_player(),
+        and state should be left unchanged.
+        """
+        if self.rollouts_per_leaf == 1:
+            winner = self.rollout_engine.rollout(state)
+            return 1 if winner == state.get_current_player() else 0 if winner < 0 else -1
+        winners = self.rollout_engine.rollout_batch(state, self.rollouts_per_leaf)
+        current_player = state.get_current_player()
+        return float(np.mean(winners == current_player) - np.mean(winners == 3 - current_player))
 
-    def __init__(self, start_state: State, c=5, n_playout=10000):
+    def update_with_move(self, action):
+        """
+        Step forward in the tree through action, keeping the subtree below it and dropping
+        the other nodes. A new tree is started if action was never expanded at the root.
+        """
+        first = int(self.first_child[self.root])
+        n_expanded = int(self.n_expanded[self.root]) if first >= 0 else 0
+        children = np.flatnonzero(self.action[first:first + n_expanded] == action)
+        if len(children) == 0:
+            self.size = 0
+            self._allocate(1024)
+            self.root = self._new_nodes(1)
+            return
+        # nodes of the subtree in breadth-first order, appending whole blocks of children
+        # so that they stay contiguous
+        first_child, n_children = self.first_child.tolist(), self.n_children.tolist()
+        order = [first + int(children[0])]
+        i = 0
+        while i < len(order):
+            f = first_child[order[i]]
+            if f >= 0:
+                order.extend(range(f, f + n_children[order[i]]))
+            i += 1
+        order = np.array(order)
+        new_index = np.full(self.size + 1, -1, dtype=np.int32)  # the last entry maps -1 to -1
+        new_index[order] = np.arange(len(order))
+        self.n_visits, self.U, self.action = self.n_visits[order], self.U[order], self.action[order]
+        self.parent, self.first_child = new_index[self.parent[order]], new_index[self.first_child[order]]
+        self.n_children, self.n_expanded = self.n_children[order], self.n_expanded[order]
+        self.size = self.capacity = len(order)
+        self._allocate(max(1024, 2 * len(order)))
+        self.root = 0
+
+    def get_root_visits(self):
+        """The actions of the expanded children of the root and their visit counts, as arrays"""
+        first = self.first_child[self.root]
+        last = first + self.n_expanded[self.root]
+        return self.action[first:last], self.n_visits[first:last]
+
+    def get_move(self):
+        """The action of the most visited child of the root"""
+        actions, n_visits = self.get_root_visits()
+        return int(actions[n_visits.argmax()])
+
+
+class TranspositionMCTS(MCTS):
+    """
+    MCTS on a directed acyclic graph of positions rather than a tree of move sequences: the move orders
+    reaching the same position share its node, found in a hash table from the key of the position to its node
+    (an open-addressing table of two arrays, at most half full).
+    With symmetries, the key is the canonical key of the position under the symmetries of the board, so
+    symmetric positions share their node too. The actions of a node are then stored for the canonical
+    position and mapped to the actions of the state through the symmetry of canonical_key; the actions
+    leading to symmetric positions are expanded once.
+
+    The nodes keep the statistics of their position and the first child (edge) of their block of edges,
+    the edges keep their action and the node they lead to (-1 until they are expanded). The UCB value of
+    an edge is computed from the statistics of the node it leads to, and a playout updates the nodes of
+    the path it took only.
+    """
+
+    def __init__(self, *args, symmetries=False, **kwargs):
         """
         Parameters:
-            c: the hyperparameter in the UCB value.
-            n_playout: the number of total playouts.
+            symmetries: share the nodes of symmetric positions.
+            The other parameters are those of the parent class.
         """
-        self.start_state = start_state
-        self.root = TreeNode(None, start_state)
-        self.c = c
-        self.n_playout = n_playout
+        self.symmetries = symmetries
+        self.n_edges = 0
+        self._allocate_edges(1024)
+        super().__init__(*args, **kwargs)
+        self._root_state = self.start_state.clone()
+        if symmetries:
+            height, width = self._root_state.get_board_array().shape
+            self._symmetries = get_symmetries(width, height)
+            # row t maps the cells of the state to those of the position transformed by t
+            self._inverse = np.argsort(self._symmetries, axis=1)
+        self._build_table(2048)
+        self._add_node(self.root, self.get_key(self._root_state)[0])
 
-    def playout(self, state: State):
+    def _allocate(self, capacity):
+        def grow(array, dtype, fill):
+            return _grow(array, capacity, self.size, dtype, fill)
+        self.n_visits = grow(getattr(self, "n_visits", None), np.int32, 0)
+        self.U = grow(getattr(self, "U", None), np.float64, 0)
+        # edges of a node are first_child .. first_child + n_children - 1, the first n_expanded of them are expanded
+        self.first_child = grow(getattr(self, "first_child", None), np.int32, -1)
+        self.n_children = grow(getattr(self, "n_children", None), np.int16, 0)
+        self.n_expanded = grow(getattr(self, "n_expanded", None), np.int16, 0)
+        # the key of the position of the node in the table
+        self.key = grow(getattr(self, "key", None), np.uint64, 0)
+        self.capacity = capacity
+
+    def _allocate_edges(self, capacity):
+        """Grow the arrays of the edges to capacity entries"""
+        self.edge_action = _grow(getattr(self, "edge_action", None), capacity, self.n_edges, np.int16, -1)
+        self.edge_child = _grow(getattr(self, "edge_child", None), capacity, self.n_edges, np.int32, -1)
+        self.edge_capacity = capacity
+
+    def _new_edges(self, n):
+        """Allocate n new edges, returning the index of the first one"""
+        if self.n_edges + n > self.edge_capacity:
+            self._allocate_edges(max(2 * self.edge_capacity, self.n_edges + n))
+        first = self.n_edges
+        self.n_edges += n
+        return first
+
+    def _build_table(self, n_slots):
+        """Build a table of n_slots slots (a power of 2) holding the nodes"""
+        self.table_keys = np.zeros(n_slots, dtype=np.uint64)
+        self.table_nodes = np.full(n_slots, -1, dtype=np.int32)
+        for node, key in enumerate(self.key[:self.size].tolist()):
+            slot = self._find_slot(key)
+            self.table_keys[slot], self.table_nodes[slot] = key, node
+
+    def _find_slot(self, key):
+        """The slot of key in the table, or the empty slot it would take"""
+        mask = len(self.table_nodes) - 1
+        slot = key & mask
+        while self.table_nodes[slot] >= 0 and self.table_keys[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def lookup(self, key):
+        """The node of the position of key, or None if it is not in the graph"""
+        node = self.table_nodes[self._find_slot(key)]
+        return None if node < 0 else int(node)
+
+    def _add_node(self, node, key):
+        self.key[node] = key
+        if 2 * self.size > len(self.table_nodes):
+            self._build_table(2 * len(self.table_nodes))
+        else:
+            slot = self._find_slot(key)
+            self.table_keys[slot], self.table_nodes[slot] = key, node
+
+    def get_key(self, state: State):
         """
-        Run a single playout from the root to the leaf, getting a value at
-        the leaf and propagating it back through its parents.
-        State is modified in-place, so a copy must be provided.
+        Return:
+            Tuple(key, symmetry): the key of state in the table and the symmetry of its canonical position
+            (None without symmetries).
         """
-        node = self.root
-        while not state.game_end()[0]:
-            unexpanded_actions = node.get_unexpanded_actions()
-            if len(unexpanded_actions) > 0:
-                action = random.choice(unexpanded_actions)
-                state.perform_action(action)
-                node.expand(action, state)
-                node = node.children[action]
-                break
-            else:
-                # Greedily select next move.
-                action, node = node.select(self.c)
-                state.perform_action(action)
+        if self.symmetries:
+            return canonical_key(state)
+        return state.get_hash(), None
 
-        leaf_value = self.get_leaf_value(state)
-        # Update value and visit count of nodes in this traversal.
-        node.update_recursive(leaf_value)
+    def _to_action(self, action, t):
+        """The action of the state for the action of its node, stored for the position transformed by t"""
+        return int(action) if t is None else int(self._symmetries[t][action])
 
-    def get_leaf_value(self, state: State):
+    def expand(self, node, state: State, t=None):
         """
-        Randomly playout until the end of the game, returning +1 if the current
-        player wins, -1 if the opponent wins, and 0 if it is a tie.
+        Allocate the edges of node, one for each action of state (the state of the node), in random order.
+        With symmetries, t is the symmetry of the canonical position of state.
+        """
+        actions = np.array(state.get_candidate_actions() if self.use_candidates else state.get_all_actions(),
+                           dtype=np.intp)
+        if t is not None:
+            actions = self._inverse[t][actions]
+            # actions of the canonical position mapped to each other by a symmetry keeping it unchanged
+            # lead to symmetric positions, only the smallest one of each orbit is kept
+            board = state.get_board_array().ravel()[self._symmetries[t]]
+            stabilizer = self._symmetries[(board[self._symmetries] == board).all(axis=1)]
+            actions = np.unique(stabilizer[:, actions].min(axis=0))
+        actions = actions.tolist()
+        random.shuffle(actions)
+        first = self._new_edges(len(actions))
+        self.edge_action[first:first + len(actions)] = actions
+        self.first_child[node] = first
+        self.n_children[node] = len(actions)
 
-        Note: the value should be under the perspective of state.get_current_player()
+    def select(self, node):
         """
-        # TODO
-        current_player = state.get_current_player()
+        Select the edge of an (entirely expanded) node with the maximum UCB value of the node it leads to.
+
+        Return: the index of the edge.
+        """
+        first = self.first_child[node]
+        children = self.edge_child[first:first + self.n_children[node]]
+        n_visits = self.n_visits[children]
+        ucb = -self.U[children] / n_visits + self.c * np.sqrt(np.log(self.n_visits[node]) / n_visits)
+        return first + int(ucb.argmax())
+
+    def descend(self, state: State):
+        """
+        Go down from the root to a leaf, expanding one new edge. The descent goes on through the node
+        the edge leads to if its position is already in the table, and stops at a new node or a terminal state.
+        State is modified in-place to the state of the leaf.
+
+        Return: the path of nodes from the root to the leaf.
+        """
+        node = self.root
+        path = [node]
+        t = self.get_key(state)[1]
         while not state.game_end()[0]:
-            state.perform_action(random.choice(state.get_all_actions()))
-        winner = state.game_end()[1]
-        return 1 if winner == current_player else 0 if winner < 0 else -1  
+            if self.first_child[node] < 0:
+                self.expand(node, state, t)
+            n_expanded = self.n_expanded[node]
+            if n_expanded < self.n_children[node]:
+                edge = int(self.first_child[node]) + int(n_expanded)
+                self.n_expanded[node] = n_expanded + 1
+                state.perform_action(self._to_action(self.edge_action[edge], t))
+                key, t = self.get_key(state)
+                child = self.lookup(key)
+                if child is None:
+                    node = self._new_nodes(1)
+                    self._add_node(node, key)
+                    self.edge_child[edge] = node
+                    path.append(node)
+                    break
+                self.edge_child[edge] = node = child
+            else:
+                edge = self.select(node)
+                state.perform_action(self._to_action(self.edge_action[edge], t))
+                t = self.get_key(state)[1]
+                node = int(self.edge_child[edge])
+            path.append(node)
+        return path
+
+    def update_with_move(self, action):
+        """
+        Step forward in the graph through action, keeping the nodes reachable from the new root
+        and dropping the other ones. A new graph is started if the new position has no node.
+        """
+        self._root_state.perform_action(action)
+        root = self.lookup(self.get_key(self._root_state)[0])
+        if root is None:
+            self.size, self.n_edges = 0, 0
+            self._allocate(1024)
+            self._allocate_edges(1024)
+            self._build_table(2048)
+            self.root = self._new_nodes(1)
+            self._add_node(self.root, self.get_key(self._root_state)[0])
+            return
+        # reachable nodes in breadth-first order, and their blocks of edges in the same order
+        first_child, n_expanded = self.first_child.tolist(), self.n_expanded.tolist()
+        edge_child = self.edge_child.tolist()
+        new_index = [-1] * self.size
+        new_index[root] = 0
+        order = [root]
+        i = 0
+        while i < len(order):
+            f = first_child[order[i]]
+            if f >= 0:
+                for child in edge_child[f:f + n_expanded[order[i]]]:
+                    if new_index[child] < 0:
+                        new_index[child] = len(order)
+                        order.append(child)
+            i += 1
+        order = np.array(order)
+        n_children = self.n_children[order].astype(np.int64)
+        edge_order = np.concatenate([np.arange(first_child[node], first_child[node] + n_children[j])
+                                     for j, node in enumerate(order.tolist()) if first_child[node] >= 0] + [[]])
+        edge_order = edge_order.astype(np.intp)
+        new_index = np.array(new_index + [-1], dtype=np.int32)  # the last entry maps -1 to -1
+        self.first_child = np.where(self.first_child[order] >= 0, np.cumsum(n_children) - n_children, -1)
+        self.n_visits, self.U, self.key = self.n_visits[order], self.U[order], self.key[order]
+        self.n_children, self.n_expanded = self.n_children[order], self.n_expanded[order]
+        self.edge_action, self.edge_child = self.edge_action[edge_order], new_index[self.edge_child[edge_order]]
+        self.size = self.capacity = len(order)
+        self.n_edges = self.edge_capacity = len(edge_order)
+        self._allocate(max(1024, 2 * self.size))
+        self._allocate_edges(max(1024, 2 * self.n_edges))
+        self._build_table(1 << max(11, (2 * self.size).bit_length()))
+        self.root = 0
+
+    def get_root_visits(self):
+        first = self.first_child[self.root]
+        children = self.edge_child[first:first + self.n_expanded[self.root]]
+        t = self.get_key(self._root_state)[1]
+        actions = self.edge_action[first:first + len(children)]
+        if t is not None:
+            actions = self._symmetries[t][actions]
+        return actions, self.n_visits[children]
+
+
+def _search_in_worker(args):
+    """
+    Search a new tree of player in a worker process.
+
+    Return: the actions of the expanded children of the root and their visit counts.
+    """
+    player, state, n_playout, time_left, seed = args
+    random.seed(seed)
+    mcts = player.new_tree(state)
+    deadline = None if time_left is None else time.perf_counter() + time_left
+    # the trees of the workers are merged, the action of one of them alone is not decided
+    n = mcts.search(state, n_playout, deadline, stop_when_decided=False)
+    return mcts.get_root_visits(), n
 
 
 class MCTSPlayer(Player):
     """AI player based on MCTS"""
-    def __init__(self, c=5, n_playout=2000):
+    def __init__(self, c=5, n_playout=2000, use_candidates=False, threat_nodes=0, reuse_tree=True, workers=1,
+                 heuristic_rollout=False, rollouts_per_leaf=1, transpositions=False, symmetries=False,
+                 time_limit=None, stop_when_decided=True):
+        """
+        Parameters:
+            n_playout: the maximum number of playouts of a move.
+            reuse_tree: keep the subtree of the position reached after the reply of the opponent
+                for the next move, rather than building a new tree every move.
+            workers: number of worker processes searching independent trees (root parallelization),
+                the playouts are split between them and the visits of the root children are summed.
+                Trees are not reused between moves with more than one worker.
+            heuristic_rollout: win or block immediate wins in the rollouts instead of playing uniformly random moves.
+            rollouts_per_leaf: number of games played (in lockstep) from each leaf, the leaf value is their average.
+            transpositions: search a graph sharing the nodes of the positions reached by different move orders
+                (TranspositionMCTS) instead of a tree.
+            symmetries: share the nodes of symmetric positions too (with transpositions).
+            time_limit: seconds per move, the search plays the best action so far when the time is up
+                (None for no limit).
+            stop_when_decided: stop the search of a move as soon as the playouts left cannot change its action
+                (not with several workers, whose trees are only merged at the end).
+        """
         super().__init__()
         self.c_puct = c
         self.n_playout = n_playout
+        self.time_limit = time_limit
+        self.stop_when_decided = stop_when_decided
+        self.use_candidates = use_candidates
+        self.heuristic_rollout = heuristic_rollout
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.transpositions = transpositions
+        self.symmetries = symmetries
+        self.set_threat_search(threat_nodes)
+        self.reuse_tree = reuse_tree
+        self.mcts = None
+        # the state of the root of the tree, after the last action of the player
+        self._tree_state = None
+        self.workers = workers
+        # pool of worker processes, started on the first search and kept alive between moves
+        self._pool = None
+
+    def __getstate__(self):
+        # the player is sent to the workers without the pool and the tree
+        state = self.__dict__.copy()
+        state["_pool"], state["mcts"], state["_tree_state"] = None, None, None
+        state["_ponder_thread"], state["_ponder_stop"] = None, None
+        return state
+
+    def close(self):
+        """Stop the worker processes."""
+        super().close()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def set_player(self, p):
+        super().set_player(p)
+        self.mcts = None
+
+    def new_tree(self, state: State):
+        if self.transpositions:
+            return TranspositionMCTS(state, self.c_puct, self.n_playout, self.use_candidates, self.heuristic_rollout,
+                                     self.rollouts_per_leaf, symmetries=self.symmetries)
+        return MCTS(state, self.c_puct, self.n_playout, self.use_candidates, self.heuristic_rollout,
+                    self.rollouts_per_leaf)
+
+    def get_tree(self, state: State):
+        """
+        The tree of the previous move (advanced through the action played) advanced through the reply
+        of the opponent, or a new tree if state does not follow from the previous move.
+        """
+        if self.reuse_tree and self.mcts is not None:
+            previous, reply = self._tree_state, state.get_last_move()
+            if reply in previous.get_all_actions():
+                previous.perform_action(reply)
+                if previous.get_hash() == state.get_hash():
+                    self.mcts.update_with_move(reply)
+                    return self.mcts
+        return self.new_tree(state)
+
+    def set_pondering(self, enabled):
+        """Pondering grows the tree of the next move, so it needs reuse_tree and a single worker."""
+        if enabled and (not self.reuse_tree or self.workers > 1):
+            raise ValueError("pondering needs reuse_tree and workers=1, as the pondered tree would be thrown away")
+        super().set_pondering(enabled)
+
+    def ponder(self, state: State, stop):
+        """
+        Go on searching the tree from the position after the move of the player, a few playouts at a time,
+        until stop is set or 10 * n_playout playouts are done (bounding the memory of the tree).
+        """
+        if self.mcts is None:
+            self.mcts, self._tree_state = self.new_tree(state), state.clone()
+        for _ in range(0, 10 * self.n_playout, 32):
+            if stop.is_set():
+                break
+            self.mcts.search(state, 32, stop_when_decided=False)
+
+    def get_parallel_action(self, state: State, start):
+        """Search independent trees with different seeds in the worker processes and merge their roots."""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        seeds = [random.getrandbits(32) for _ in range(self.workers)]
+        time_left = None if self.time_limit is None else self.time_limit - (time.perf_counter() - start)
+        tasks = [(self, state, self.n_playout // self.workers + (i < self.n_playout % self.workers), time_left, seed)
+                 for i, seed in enumerate(seeds)]
+        search_start = time.perf_counter()
+        root_visits, playouts = zip(*self._pool.map(_search_in_worker, tasks))
+        actions, n_visits = zip(*root_visits)
+        n_visits = np.bincount(np.concatenate(actions).astype(np.intp), weights=np.concatenate(n_visits))
+        actions = np.flatnonzero(n_visits)
+        self.root_visits = actions, n_visits[actions].astype(np.int64)
+        elapsed = time.perf_counter() - search_start
+        self.stats.update({"playouts": sum(playouts), "playouts_per_second": sum(playouts) / elapsed,
+                           "workers": self.workers, "time": time.perf_counter() - start})
+        return int(n_visits.argmax())
 
     def get_action(self, state: State):
-        mcts = MCTS(state, self.c_puct, self.n_playout)
-        for n in range(self.n_playout):
-            state_copy = copy.deepcopy(state)
-            mcts.playout(state_copy)
-        return max(mcts.root.children.items(),
-                   key=lambda act_node: act_node[1].n_visits)[0]
+        """
+        Search up to n_playout playouts (and up to time_limit seconds) and play the most visited action.
+        With pondering on, the visits of the root found on the opponent's time count towards n_playout,
+        so the move is faster when the reply was expected.
+        """
+        self.stop_pondering()
+        start = time.perf_counter()
+        self.root_visits = None
+        action = self.get_threat_action(state)
+        if action is not None:
+            self.mcts = None
+            self.start_pondering(state, action)
+            return action
+        if self.workers > 1:
+            return self.get_parallel_action(state, start)
+        mcts = self.get_tree(state)
+        reused_visits = int(mcts.n_visits[mcts.root])
+        n_playout = max(self.n_playout - reused_visits, 1) if self.pondering else self.n_playout
+        deadline = None if self.time_limit is None else start + self.time_limit
+        mcts.max_depth, mcts.counting = 0, self.counting
+        search_start = time.perf_counter()
+        with Profile(mcts, "get_leaf_value", "get_leaf_values", enabled=self.profiling) as profile, \
+                Profile(type(state), "get_info", enabled=self.profiling) as info_profile, \
+                Profile(evaluation, "_get_info_batch", enabled=self.profiling) as batch_info_profile:
+            n_playout = mcts.search(state, n_playout, deadline, self.stop_when_decided)
+        search_time = time.perf_counter() - search_start
+        actions, n_visits = mcts.get_root_visits()
+        self.root_visits = actions.copy(), n_visits.copy()
+        action = mcts.get_move()
+        self.stats.update({"playouts": n_playout, "playouts_per_second": n_playout / search_time,
+                           "evaluations": n_playout, "reused_visits": reused_visits, "nodes": mcts.size,
+                           "time": time.perf_counter() - start})
+        if self.counting:
+            self.stats["max_depth"] = mcts.max_depth
+        if self.profiling:
+            self.stats["evaluation_time"] = profile.time
+            self.stats["get_info_time"] = info_profile.time + batch_info_profile.time
+        if self.reuse_tree:
+            mcts.update_with_move(action)
+            self.mcts, self._tree_state = mcts, state.clone()
+            self._tree_state.perform_action(action)
+            self.start_pondering(state, action)
+        return action
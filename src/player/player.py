@@ -1,16 +1,117 @@
+import time
+import threading
 from state import State
+from search import ThreatSpaceSearch
 
 class Player(object):
-    """A general player for two-player zero-sum game."""
+    """
+    A general player for two-player zero-sum game.
+
+    The statistics of the last get_action call are kept in self.stats, with the keys that apply to the player
+    (with the counters of the searches switched off by set_stats, only time and the values known without them):
+        time: wall time of the move in seconds,
+        nodes: nodes searched (tree nodes for MCTS/AlphaZero),
+        cutoffs: beta cutoffs of alpha-beta searches,
+        re_searches: null-window (and aspiration window) searches of alpha-beta searches searched again,
+        evaluations: calls to the evaluation function (leaf evaluations for MCTS/AlphaZero),
+        evaluation_time: seconds spent in them, including get_info (only with profiling on),
+        get_info_time: seconds spent getting the info of the states, within evaluation_time (only with profiling on),
+        tt_probes, tt_hits, tt_hit_rate: use of the transposition table,
+        playouts, playouts_per_second: MCTS/AlphaZero playouts,
+        max_depth: deepest ply searched from the root,
+        threat, threat_nodes: result and nodes of the threat-space search,
+        book: whether the move came from the opening book.
+    """
 
     def __init__(self):
         self.player = None
+        # statistics of the last get_action call
+        self.stats = {}
+        # count the nodes, evaluations, cutoffs... of the searches in self.stats
+        self.counting = True
+        # time the evaluations of the searches, which costs a timer per call
+        self.profiling = False
+        # Tuple(actions, n_visits) of the children of the root in the last search (MCTS players), None otherwise
+        self.root_visits = None
+        # search on the opponent's time, in a background thread
+        self.pondering = False
+        self._ponder_thread, self._ponder_stop = None, None
+        # threat-space search run before the search of the player, None to skip it
+        self.threat_search = None
 
     def set_player(self, p):
+        self.stop_pondering()
         self.player = p
 
     def get_action(self, state: State):
         raise NotImplementedError
 
+    def set_stats(self, enabled):
+        """
+        Count the nodes, evaluations, cutoffs, transposition table probes and tree depth of the searches
+        in self.stats, or skip the counters in the search loops.
+        """
+        self.counting = enabled
+
+    def set_profiling(self, enabled):
+        """Time the evaluations of the searches in self.stats["evaluation_time"], or stop timing them."""
+        self.profiling = enabled
+
+    def close(self):
+        """Release the resources held by the player, such as worker processes."""
+        self.stop_pondering()
+
+    def set_pondering(self, enabled):
+        """
+        Search on the opponent's time: after each move, the position it leads to is searched in a background
+        thread until the next call to get_action, which goes on from what was found (players overriding ponder only).
+        The thread competes for the GIL with the rest of the process, so it is only meant against a human opponent.
+        """
+        self.pondering = enabled
+
+    def ponder(self, state: State, stop: threading.Event):
+        """
+        Search state, the position after the last move of the player, until stop is set,
+        keeping the results useful to the next move (a subtree, transposition table entries).
+        """
+        pass
+
+    def start_pondering(self, state: State, action):
+        """Start pondering on the position after action is played in state (with pondering on)."""
+        if not self.pondering:
+            return
+        state = state.clone()
+        state.perform_action(action)
+        if state.game_end()[0]:
+            return
+        self._ponder_stop = threading.Event()
+        self._ponder_thread = threading.Thread(target=self.ponder, args=(state, self._ponder_stop), daemon=True)
+        self._ponder_thread.start()
+
+    def stop_pondering(self):
+        """Stop the background search, if any, and wait for it to finish."""
+        if self._ponder_thread is not None:
+            self._ponder_stop.set()
+            self._ponder_thread.join()
+            self._ponder_thread, self._ponder_stop = None, None
+
+    def set_threat_search(self, max_nodes):
+        """Solve the threats on the board with a node budget of max_nodes before searching, 0 to disable it."""
+        self.threat_search = ThreatSpaceSearch(max_nodes) if max_nodes > 0 else None
+
+    def get_threat_action(self, state: State):
+        """
+        The move decided by the threats on the board: an immediate win or block, or the first move
+        of a forced win. None if there is none (or no threat search is set).
+        """
+        self.stats = {}
+        if self.threat_search is None:
+            return None
+        start = time.perf_counter()
+        action = self.threat_search.solve(state)
+        self.stats = {"threat": self.threat_search.result, "threat_nodes": self.threat_search.nodes,
+                      "time": time.perf_counter() - start}
+        return action
+
     def __str__(self):
         return f"{self.__class__.__name__} {self.player}"
\ No newline at end of file
@@ -0,0 +1,6 @@
+from .transposition_table import *
+from .move_ordering import *
+from .threat_space import *
+from .rollout import *
+from .opening_book import *
+from .negamax import *
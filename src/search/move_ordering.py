@@ -0,0 +1,70 @@
+from state import State
+
+
+class MoveOrderer(object):
+    """
+    Orders the actions of a node for alpha-beta search, most promising first:
+        1. the best move stored in the transposition table (or found by a previous search),
+        2. moves winning immediately, then moves blocking an immediate win of the opponent,
+        3. the other moves by their pattern score, i.e. the lines of both players they extend,
+           with killer moves of the same ply and the history table breaking ties.
+    """
+
+    def __init__(self, n_killers=2):
+        """
+        Parameters:
+            n_killers: number of killer moves kept for every ply.
+        """
+        self.n_killers = n_killers
+        self.killers = []
+        # history table kept across the game, from move to the accumulated bonus of its cutoffs
+        self.history = {}
+
+    def new_search(self):
+        """Forget the killer moves of the previous search, the history table is kept."""
+        self.killers = []
+
+    def clear(self):
+        self.killers = []
+        self.history = {}
+
+    def record_cutoff(self, action, ply, depth):
+        """Record an action causing a beta cutoff at ply with depth remaining."""
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[self.n_killers:]
+        self.history[action] = self.history.get(action, 0) + depth * depth
+
+    def order(self, state: State, actions, ply, best_move=None):
+        """
+        Return a new list of actions sorted by the ordering above.
+
+        Parameters:
+            state: the state the actions are performed on
+            actions: the actions to order
+            ply: distance of the state from the root of the search
+            best_move: the best move known for the state (from the transposition table), if any
+        """
+        n = state.n_in_row
+        player = state.get_current_player()
+        opponent = 3 - player
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+        keys = {}
+        for action in actions:
+            own = state.get_line_lengths(action, player)
+            other = state.get_line_lengths(action, opponent)
+            if action == best_move:
+                category = 3
+            elif max(own) >= n:
+                category = 2
+            elif max(other) >= n:
+                category = 1
+            else:
+                category = 0
+            score = sum(4 ** length for length in own) + sum(4 ** length for length in other)
+            keys[action] = (category, score, action in killers, history.get(action, 0))
+        return sorted(actions, key=keys.__getitem__, reverse=True)
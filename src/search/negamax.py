@@ -0,0 +1,205 @@
+import time
+from state import State
+from .transposition_table import tt_move_first, EXACT, LOWER, UPPER
+
+inf = 10000
+# width of the null windows of principal variation search, below the differences of the evaluations
+NULL_WINDOW = 1e-9
+
+
+class SearchStopped(Exception):
+    """Raised inside the search when the deadline has passed or the stop event is set"""
+
+
+class NegamaxSearch(object):
+    """
+    Depth-limited negamax search, shared by the alpha-beta players.
+
+    Values are in the perspective of the player to move at each node: +1 for a won game, -1 for a lost one,
+    0 for a tie, and the evaluation function at the leaves. With pruning, the search is alpha-beta with
+    principal variation search: the first action of a node is searched with the full window, the others
+    with a null window only proving they are not better, and re-searched with the full window when they are.
+    This only saves nodes in searches of 3 plies or more: at 2 plies, the null windows prune little below
+    the root and the re-searches can visit slightly more nodes than plain alpha-beta.
+    Results are kept in the transposition table together with the remaining depth, an entry searched
+    at least as deep returns (or narrows the window) immediately.
+    """
+
+    def __init__(self, evaluation_func=None, tt=None, orderer=None, use_candidates=False, pruning=True, pvs=True):
+        """
+        Parameters:
+            evaluation_func: a function taking a state as input and
+                outputs the value in the current player's perspective.
+            tt: the TranspositionTable of the search, None for no table.
+            orderer: the MoveOrderer of the search, None to search the actions in the order of the state
+                (after the best move known).
+            use_candidates: only search the candidate actions of the state (empty cells near the pieces).
+            pruning: alpha-beta pruning, without it the search is plain minimax.
+            pvs: principal variation search (with pruning).
+        """
+        self.evaluation_func = (lambda s: 0) if evaluation_func is None else evaluation_func
+        self.tt = tt
+        self.orderer = orderer
+        self.use_candidates = use_candidates
+        self.pruning = pruning
+        self.pvs = pvs and pruning
+        # count the nodes, evaluations, cutoffs and re-searches in self.stats
+        self.counting = True
+        self.stats = {}
+        self.new_search()
+
+    def new_search(self):
+        """Start the search of a move: reset the counters, the killer moves and the generation of the table."""
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+        if self.counting:
+            self.stats = {"nodes": 0, "evaluations": 0, "cutoffs": 0, "re_searches": 0, "max_depth": 0}
+        else:
+            self.stats = {}
+
+    def evaluate(self, state: State):
+        """The value of a leaf in the perspective of the player to move."""
+        return self.evaluation_func(state)
+
+    def search(self, state: State, depth=None, alpha=-inf, beta=inf, prev_line=(), deadline=None, stop=None):
+        """
+        Search state to depth plies.
+
+        Parameters:
+            state: the state to search, actions are performed and cancelled in-place on it.
+            depth: the depth in plies, None to search to the end of the game.
+            alpha, beta: the window of the search.
+            prev_line: the best line of a previous search, followed first while the search stays on it.
+            deadline: time.perf_counter() time the search is stopped at, None for no limit.
+            stop: threading.Event stopping the search when set, None to never stop.
+
+        Return:
+            Tuple(value, line): the value of state in the perspective of its player to move
+            and the best line of actions from it (empty if none).
+
+        Raises SearchStopped when the deadline has passed or stop is set, leaving state in the middle of the search.
+        """
+        stats, tt, orderer = self.stats, self.tt, self.orderer
+        pruning, pvs, counting = self.pruning, self.pvs, self.counting
+
+        def negamax(s: State, d, alpha, beta, ply, on_line):
+            """
+            Parameters:
+                s: the current state
+                d: the remaining search depth in plies, the search will stop when d=0
+                alpha: the value the player to move is already guaranteed
+                beta: the value the opponent is already guaranteed, as a bound of the player to move
+                ply: the distance from the root
+                on_line: whether the moves from the root to s follow prev_line
+
+            Return:
+                Tuple(value, line): the node value and the best line of actions from s (empty if none)
+
+            Note: cancelling restores the order of s.get_all_actions(), so the loop can iterate over it directly.
+            """
+            if counting:
+                stats["nodes"] += 1
+            if deadline is not None and time.perf_counter() > deadline or stop is not None and stop.is_set():
+                raise SearchStopped
+            end, winner = s.game_end()
+            if end:
+                if counting:
+                    stats["max_depth"] = max(stats["max_depth"], ply)
+                if winner == -1:
+                    return 0, []
+                return (1 if winner == s.get_current_player() else -1), []
+            if d == 0:
+                if counting:
+                    stats["max_depth"] = max(stats["max_depth"], ply)
+                    stats["evaluations"] += 1
+                return self.evaluate(s), []
+            best_move = prev_line[ply] if on_line and ply < len(prev_line) else None
+            if tt is not None:
+                entry = tt.probe(s.get_hash())
+                if entry is not None:
+                    tt_depth, tt_flag, tt_value, tt_move = entry
+                    # the line below a stored entry is not kept, only its first move
+                    tt_line = [tt_move] if tt_move >= 0 else []
+                    # nodes on the previous best line are searched again to extend the line
+                    if tt_depth >= d and not on_line:
+                        if tt_flag == EXACT:
+                            return tt_value, tt_line
+                        elif tt_flag == LOWER:
+                            alpha = max(alpha, tt_value)
+                        else:
+                            beta = min(beta, tt_value)
+                        if alpha >= beta:
+                            return tt_value, tt_line
+                    if best_move is None:
+                        best_move = tt_move
+            alpha_0 = alpha
+            value, line = -inf, []
+            actions = s.get_candidate_actions() if self.use_candidates else s.get_all_actions()
+            if orderer is not None:
+                actions = orderer.order(s, actions, ply, best_move)
+            else:
+                actions = tt_move_first(actions, best_move)
+            for i, action in enumerate(actions):
+                child_on_line = on_line and action == best_move
+                s.perform_action(action)
+                if pvs and i > 0:
+                    child_value, child_line = negamax(s, d - 1, -alpha - NULL_WINDOW, -alpha, ply + 1, child_on_line)
+                    if alpha < -child_value < beta:
+                        if counting:
+                            stats["re_searches"] += 1
+                        child_value, child_line = negamax(s, d - 1, -beta, -alpha, ply + 1, child_on_line)
+                else:
+                    child_value, child_line = negamax(s, d - 1, -beta, -alpha, ply + 1, child_on_line)
+                s.cancel_action()
+                if -child_value > value:
+                    value, line = -child_value, [action] + child_line
+                if pruning:
+                    if value >= beta:
+                        if counting:
+                            stats["cutoffs"] += 1
+                        if orderer is not None:
+                            orderer.record_cutoff(action, ply, d)
+                        break
+                    alpha = max(alpha, value)
+            if tt is not None:
+                bound = UPPER if value <= alpha_0 else LOWER if value >= beta else EXACT
+                tt.store(s.get_hash(), d, bound, value, line[0] if line else None)
+            return value, line
+
+        if depth is None:
+            # the game ends before every empty cell is filled
+            depth = len(state.get_all_actions())
+        return negamax(state, depth, alpha, beta, 0, len(prev_line) > 0)
+
+    def iterative_deepening(self, state: State, depths, deadline=None, stop=None, aspiration=None):
+        """
+        Search state to each of depths in turn, starting each iteration with the best line of the previous
+        one, until the deadline has passed or stop is set.
+
+        Parameters:
+            aspiration: half width of the window around the value of the previous iteration the next one
+                is searched with, re-searching with the full window when the value falls outside of it.
+                None to always search with the full window.
+
+        Return:
+            Tuple(action, depth, value): the best action of the deepest completed iteration (None if there
+            is none), its depth in plies and its value.
+        """
+        action, completed_depth, value, prev_line = None, 0, None, []
+        for depth in depths:
+            try:
+                alpha, beta = -inf, inf
+                if aspiration is not None and value is not None:
+                    alpha, beta = value - aspiration, value + aspiration
+                new_value, line = self.search(state.clone(), depth, alpha, beta, prev_line, deadline, stop)
+                if not alpha < new_value < beta and (alpha, beta) != (-inf, inf):
+                    if self.counting:
+                        self.stats["re_searches"] += 1
+                    new_value, line = self.search(state.clone(), depth, -inf, inf, prev_line, deadline, stop)
+            except SearchStopped:
+                break
+            if line:
+                action, prev_line, completed_depth, value = line[0], line, depth, new_value
+        return action, completed_depth, value
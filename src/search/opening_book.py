@@ -0,0 +1,166 @@
+import functools
+import random
+import numpy as np
+from state import State
+from state.zobrist import get_zobrist_keys
+
+_MAGIC = b'GMKBOOK1'
+# magic, width, height, n_in_row, number of slots
+_HEADER = np.dtype([('magic', 'S8'), ('width', '<u4'), ('height', '<u4'), ('n_in_row', '<u4'),
+                    ('reserved', '<u4'), ('n_slots', '<u8')])
+
+
+@functools.lru_cache(maxsize=None)
+def get_symmetries(width, height):
+    """
+    The symmetries of a width x height board: the 8 rotations and reflections of a square board,
+    or the 4 of them keeping the shape of a rectangular one.
+
+    Return:
+        Array of shape (n_symmetries, width * height), row t mapping each cell of the board
+        transformed by t to the cell of the original board it comes from.
+    """
+    cells = np.arange(width * height).reshape(height, width)
+    transforms = [cells, cells[::-1], cells[:, ::-1], cells[::-1, ::-1]]
+    if width == height:
+        transforms += [cells.T, cells.T[::-1], cells.T[:, ::-1], cells.T[::-1, ::-1]]
+    return np.array([t.ravel() for t in transforms])
+
+
+@functools.lru_cache(maxsize=None)
+def _get_inverse_symmetries(width, height):
+    """Row t maps each cell of the board to its cell on the board transformed by row t of get_symmetries"""
+    return np.argsort(get_symmetries(width, height), axis=1)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_keys(size):
+    piece_keys, side_key = get_zobrist_keys(size)
+    return np.array(piece_keys, dtype=np.uint64), np.uint64(side_key)
+
+
+def canonical_key(state: State):
+    """
+    Key of the position under the symmetries of the board: the smallest Zobrist hash of the
+    position transformed by each symmetry.
+
+    Return:
+        Tuple(key, symmetry): the key and the row of get_symmetries giving it.
+    """
+    board = state.get_board_array()
+    height, width = board.shape
+    inverse = _get_inverse_symmetries(width, height)
+    (keys_1, keys_2), side_key = _get_keys(width * height)
+    board = board.ravel()
+    # the piece on cell c is on cell inverse[t][c] of the position transformed by t
+    hashes = np.bitwise_xor.reduce(keys_1[inverse[:, board == 1]], axis=1) ^ \
+        np.bitwise_xor.reduce(keys_2[inverse[:, board == 2]], axis=1)
+    if state.get_current_player() == 2:
+        hashes ^= side_key
+    t = int(hashes.argmin())
+    return int(hashes[t]), t
+
+
+class OpeningBook(object):
+    """
+    Moves for the positions of the opening, stored by canonical_key in an open-addressing hash table
+    of a binary file: a header, then the keys (uint64) and the moves (int16, -1 for an empty slot)
+    of the slots. The moves are those of the canonical position and are transformed back on lookup.
+
+    The file is memory-mapped on the first lookup, so only the pages of the probed slots are read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._header, self._keys, self._moves = None, None, None
+
+    def _open(self):
+        self._header = np.fromfile(self.path, dtype=_HEADER, count=1)[0]
+        if self._header['magic'] != _MAGIC:
+            raise ValueError('{} is not an opening book'.format(self.path))
+        n_slots = int(self._header['n_slots'])
+        self._keys = np.memmap(self.path, dtype='<u8', mode='r', offset=_HEADER.itemsize, shape=(n_slots,))
+        self._moves = np.memmap(self.path, dtype='<i2', mode='r', offset=_HEADER.itemsize + 8 * n_slots,
+                                shape=(n_slots,))
+
+    def lookup(self, state: State):
+        """
+        The book move for state, or None if the position is not in the book
+        (or the book is for another board size or n_in_row).
+        """
+        if self._header is None:
+            self._open()
+        height, width = state.get_board_array().shape
+        if (width, height, state.n_in_row) != \
+                (self._header['width'], self._header['height'], self._header['n_in_row']):
+            return None
+        key, t = canonical_key(state)
+        mask = len(self._keys) - 1
+        slot = key & mask
+        while self._moves[slot] >= 0:
+            if self._keys[slot] == key:
+                return int(get_symmetries(width, height)[t][self._moves[slot]])
+            slot = (slot + 1) & mask
+        return None
+
+    @staticmethod
+    def write(path, entries, width, height, n_in_row):
+        """
+        Write a book file.
+
+        Parameters:
+            entries: dict from canonical_key to the move of the canonical position.
+        """
+        n_slots = 1 << max(4, (2 * len(entries)).bit_length())  # at most half full
+        keys = np.zeros(n_slots, dtype='<u8')
+        moves = np.full(n_slots, -1, dtype='<i2')
+        mask = n_slots - 1
+        for key, move in entries.items():
+            slot = key & mask
+            while moves[slot] >= 0:
+                slot = (slot + 1) & mask
+            keys[slot], moves[slot] = key, move
+        header = np.array([(_MAGIC, width, height, n_in_row, 0, n_slots)], dtype=_HEADER)
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(keys.tobytes())
+            f.write(moves.tobytes())
+
+
+def build_opening_book(player_1, player_2, state: State, n_plies, n_replies=3, seed=0):
+    """
+    Build the entries of an opening book by searching the positions of the first n_plies plies.
+    In each position, the move of the searching player for the side to move is stored, and the
+    search continues with that move and n_replies - 1 other candidate actions.
+
+    Parameters:
+        player_1, player_2: the players searching the positions of player 1 and 2.
+        state: the starting position.
+        n_plies: number of plies covered by the book.
+        n_replies: number of moves followed from each position.
+
+    Return:
+        Dict from canonical_key to the move of the canonical position, as taken by OpeningBook.write.
+    """
+    rng = random.Random(seed)
+    players = {1: player_1, 2: player_2}
+    player_1.set_player(1)
+    player_2.set_player(2)
+    entries = {}
+    frontier = [state.clone()]
+    for _ in range(n_plies):
+        next_frontier = []
+        for s in frontier:
+            if s.game_end()[0]:
+                continue
+            key, t = canonical_key(s)
+            if key in entries:
+                continue
+            move = players[s.get_current_player()].get_action(s)
+            height, width = s.get_board_array().shape
+            entries[key] = int(np.flatnonzero(get_symmetries(width, height)[t] == move)[0])
+            others = [a for a in s.get_candidate_actions() if a != move]
+            for a in [move] + rng.sample(others, min(n_replies - 1, len(others))):
+                next_frontier.append(s.clone().perform_action(a))
+        frontier = next_frontier
+    return entries
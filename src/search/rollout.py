@@ -0,0 +1,186 @@
+import functools
+import random
+import numpy as np
+from state import State, DIRECTIONS, get_lines
+
+
+@functools.lru_cache(maxsize=None)
+def _get_windows(width, height, n_in_row):
+    """Cells of all windows of n_in_row consecutive cells of a width x height board, as an array"""
+    return np.array([line[i:i + n_in_row] for line in get_lines(width, height)
+                     for i in range(len(line) - n_in_row + 1)], dtype=np.intp).reshape(-1, n_in_row)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_rays(width, height, n_in_row):
+    """
+    For every cell, the (forward, backward) rays of the cells within n_in_row - 1 steps
+    in each of the four directions.
+    """
+    def ray(h, w, dh, dw):
+        cells = []
+        for k in range(1, n_in_row):
+            i, j = h + k * dh, w + k * dw
+            if not (0 <= i < height and 0 <= j < width):
+                break
+            cells.append(i * width + j)
+        return tuple(cells)
+    return [tuple((ray(h, w, dh, dw), ray(h, w, -dh, -dw)) for dh, dw in DIRECTIONS)
+            for h in range(height) for w in range(width)]
+
+
+class RolloutEngine(object):
+    """
+    Plays random games to the end from a state, on a flat copy of its board.
+
+    A uniformly random game is a random order of the empty cells, played in turn. All moves of the
+    order are placed at once, and the game is won by the first line of n_in_row pieces of one player
+    to be completed, i.e. the one whose last move comes first in the order. This is found with NumPy
+    over all windows of n_in_row cells, giving the same result as playing the moves one by one.
+
+    With the heuristic policy, a player completes n_in_row whenever possible and otherwise blocks
+    an immediate win of the opponent, so the moves are played one by one. The winning cells of each
+    player are updated after each move from the lines through it.
+    """
+
+    def __init__(self, heuristic=False):
+        """
+        Parameters:
+            heuristic: use the win/block policy instead of uniformly random moves.
+        """
+        self.heuristic = heuristic
+        # seeded from the random module, so that random.seed also fixes the rollouts
+        self._rng = np.random.default_rng(random.getrandbits(64))
+
+    def rollout(self, state: State):
+        """
+        Play a game from state (which is not modified) to the end.
+
+        Return:
+            The winner of the game, or -1 for a tie.
+        """
+        end, winner = state.game_end()
+        if end:
+            return winner
+        board = state.get_board_array()
+        height, width = board.shape
+        board = board.ravel()
+        order = self._rng.permutation(np.flatnonzero(board == 0))
+        if self.heuristic:
+            return self._heuristic_rollout(bytearray(board.tobytes()), order.tolist(), width, height,
+                                           state.n_in_row, state.get_current_player())
+        return self._random_rollout(board, order, width, height, state.n_in_row, state.get_current_player())
+
+    def rollout_batch(self, state: State, n_games):
+        """
+        Play n_games games from state (which is not modified) to the end. Random games are played
+        in lockstep, as the rows of arrays of shape (n_games, height * width).
+
+        Return:
+            Array of the winners of the games, -1 for a tie.
+        """
+        if n_games == 1:
+            return np.array([self.rollout(state)])
+        end, winner = state.game_end()
+        if end:
+            return np.full(n_games, winner)
+        board = state.get_board_array()
+        height, width = board.shape
+        board = board.ravel()
+        empty = np.flatnonzero(board == 0)
+        orders = self._rng.permuted(np.broadcast_to(empty, (n_games, len(empty))), axis=1)
+        if self.heuristic:
+            return np.array([self._heuristic_rollout(bytearray(board.tobytes()), order, width, height,
+                                                     state.n_in_row, state.get_current_player())
+                             for order in orders.tolist()])
+        return self._random_rollouts(board, orders, width, height, state.n_in_row, state.get_current_player())
+
+    @staticmethod
+    def _random_rollout(board, order, width, height, n, player):
+        windows = _get_windows(width, height, n)
+        # the time each cell is taken at, -1 for the pieces already on the board
+        times = np.full(board.size, -1, dtype=np.int16)
+        times[order] = np.arange(len(order), dtype=np.int16)
+        board[order[0::2]] = player
+        board[order[1::2]] = 3 - player
+        # number of pieces in each window, every cell being taken by one of the players (1 or 2)
+        sums = board[windows].sum(axis=1, dtype=np.int16)
+        complete = np.flatnonzero((sums == n) | (sums == 2 * n))
+        if not len(complete):
+            return -1
+        first = complete[times[windows[complete]].max(axis=1).argmin()]
+        return int(board[windows[first, 0]])
+
+    @staticmethod
+    def _random_rollouts(board, orders, width, height, n, player):
+        """_random_rollout for a batch of orders, one game per row"""
+        windows = _get_windows(width, height, n)
+        n_games, n_moves = orders.shape
+        games = np.arange(n_games)[:, None]
+        times = np.full((n_games, board.size), -1, dtype=np.int16)
+        times[games, orders] = np.arange(n_moves, dtype=np.int16)
+        boards = np.repeat(board[None], n_games, axis=0)
+        boards[games, orders[:, 0::2]] = player
+        boards[games, orders[:, 1::2]] = 3 - player
+        sums = boards[:, windows].sum(axis=2, dtype=np.int16)
+        complete_times = np.where((sums == n) | (sums == 2 * n), times[:, windows].max(axis=2), n_moves)
+        first = complete_times.argmin(axis=1)
+        winners = boards[games[:, 0], windows[first, 0]].astype(np.int64)
+        winners[complete_times[games[:, 0], first] == n_moves] = -1
+        return winners
+
+    def _heuristic_rollout(self, cells, moves, width, height, n, player):
+        rays = _get_rays(width, height, n)
+        # cells completing n_in_row for player 1 and 2, some of them may have been taken since
+        wins = ([], [])
+        for move, p in enumerate(cells):
+            if p:
+                self._add_win_cells(cells, rays, n, move, p, wins[p - 1])
+        i = 0
+        for _ in range(len(moves)):
+            if self._pop_empty(cells, wins[player - 1]) is not None:
+                return player
+            move = self._pop_empty(cells, wins[2 - player])
+            if move is None:
+                while cells[moves[i]]:
+                    i += 1
+                move = moves[i]
+            cells[move] = player
+            self._add_win_cells(cells, rays, n, move, player, wins[player - 1])
+            player = 3 - player
+        return -1
+
+    @staticmethod
+    def _pop_empty(cells, candidates):
+        """Remove the taken cells from the end of candidates, returning the last empty one (or None)"""
+        while candidates:
+            if not cells[candidates[-1]]:
+                return candidates[-1]
+            candidates.pop()
+        return None
+
+    @staticmethod
+    def _add_win_cells(cells, rays, n, move, player, wins):
+        """
+        Add the cells completing n_in_row for player through move (held by player) to wins.
+        Such a cell is the first cell not held by player on either side of move in one direction.
+        """
+        for d, move_rays in enumerate(rays[move]):
+            runs = [_run(cells, ray, player) for ray in move_rays]
+            for side in (0, 1):
+                ray = move_rays[side]
+                if runs[side] < len(ray) and not cells[ray[runs[side]]]:
+                    end = ray[runs[side]]
+                    # pieces of move's line on both sides, the empty cell and the pieces beyond it
+                    if runs[0] + runs[1] + 2 + _run(cells, rays[end][d][side], player) >= n:
+                        wins.append(end)
+
+
+def _run(cells, ray, player):
+    """Number of consecutive pieces of player at the start of ray"""
+    count = 0
+    for m in ray:
+        if cells[m] != player:
+            break
+        count += 1
+    return count
@@ -0,0 +1,224 @@
+import functools
+from state import State, get_lines
+
+
+@functools.lru_cache(maxsize=None)
+def _get_windows(width, height, n_in_row):
+    """
+    All windows of n_in_row consecutive cells of a width x height board, and for every cell
+    the indices of the windows containing it.
+    """
+    windows = []
+    for line in get_lines(width, height):
+        for i in range(len(line) - n_in_row + 1):
+            windows.append(tuple(line[i:i + n_in_row]))
+    cell_windows = [[] for _ in range(width * height)]
+    for j, window in enumerate(windows):
+        for cell in window:
+            cell_windows[cell].append(j)
+    return windows, cell_windows
+
+
+class _BudgetExceeded(Exception):
+    """Raised inside the search when the node budget is used up"""
+
+
+class ThreatSpaceSearch(object):
+    """
+    Threat-space search: only the threats of the attacker (the player to move) are searched,
+    together with the forced replies of the defender.
+        - a four threatens to win on the next move, so the defender has to block its only winning cell,
+        - an open three threatens to make an open four (two winning cells), so the defender has to play
+          on one of the cells of the threat or make a four of his own.
+    Searching fours only is a VCF (victory by continuous fours) search, adding open threes makes
+    it a VCT (victory by continuous threats) search. A proven win is a win against every defence.
+
+    Every window of n_in_row cells keeps the number of pieces of each player in it, so threats are
+    found from the windows holding pieces of one player only.
+    """
+
+    def __init__(self, max_nodes=10000, max_depth=10, use_threes=True):
+        """
+        Parameters:
+            max_nodes: node budget of one call to solve, the search gives up when it is used up.
+            max_depth: maximum number of attacker moves in a forcing sequence.
+            use_threes: search open threes after the fours (VCT), or fours only (VCF).
+        """
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.use_threes = use_threes
+        # statistics of the last call to solve
+        self.nodes = 0
+        self.result = None
+
+    def solve(self, state: State):
+        """
+        Look for a move decided by the threats on the board, in this order:
+            1. a move winning immediately ("win"),
+            2. a move blocking an immediate win of the opponent ("block"),
+            3. the first move of a winning sequence of fours ("vcf"), then of fours and threes ("vct").
+
+        Parameters:
+            state: the state to solve, it is not modified.
+
+        Return:
+            The move, or None if nothing was proven within the budget. The kind of the move is kept in self.result.
+        """
+        board = state.get_board_array()
+        height, width = board.shape
+        self._n = state.n_in_row
+        self._windows, self._cell_windows = _get_windows(width, height, self._n)
+        self._cells = [0] * (width * height)
+        # number of pieces of each player in each window, indexed by player - 1
+        self._counts = [[0] * len(self._windows), [0] * len(self._windows)]
+        # windows holding k > 0 pieces of a player and none of the other one, indexed by player - 1 and k
+        self._levels = [[set() for _ in range(self._n + 1)] for _ in range(2)]
+        for move, player in enumerate(board.ravel().tolist()):
+            if player:
+                self._place(move, player)
+
+        self.nodes, self.result = 0, None
+        attacker = state.get_current_player()
+        defender = 3 - attacker
+        wins = self._win_cells(attacker)
+        if wins:
+            self.result = "win"
+            return min(wins)
+        blocks = self._win_cells(defender)
+        if blocks:
+            self.result = "block"
+            return min(blocks)
+        try:
+            for kind, use_threes in (("vcf", False), ("vct", True)):
+                if use_threes and not self.use_threes:
+                    break
+                for depth in range(1, self.max_depth + 1):
+                    move = self._attack(attacker, depth, use_threes)
+                    if move is not None:
+                        self.result = kind
+                        return move
+        except _BudgetExceeded:
+            pass
+        return None
+
+    def _place(self, cell, player):
+        self._cells[cell] = player
+        own, other = self._counts[player - 1], self._counts[2 - player]
+        own_levels, other_levels = self._levels[player - 1], self._levels[2 - player]
+        for w in self._cell_windows[cell]:
+            a, b = own[w], other[w]
+            own[w] = a + 1
+            if b == 0:
+                own_levels[a].discard(w)
+                own_levels[a + 1].add(w)
+            elif a == 0:
+                other_levels[b].discard(w)
+
+    def _remove(self, cell, player):
+        self._cells[cell] = 0
+        own, other = self._counts[player - 1], self._counts[2 - player]
+        own_levels, other_levels = self._levels[player - 1], self._levels[2 - player]
+        for w in self._cell_windows[cell]:
+            a, b = own[w] - 1, other[w]
+            own[w] = a
+            if b == 0:
+                own_levels[a + 1].discard(w)
+                own_levels[a].add(w)
+            elif a == 0:
+                other_levels[b].add(w)
+
+    def _empty_cells(self, player, level):
+        """Empty cells of the windows holding level pieces of player and none of the other one"""
+        cells = self._cells
+        return {c for w in self._levels[player - 1][level] for c in self._windows[w] if not cells[c]}
+
+    def _win_cells(self, player):
+        """Cells completing n_in_row for player"""
+        return self._empty_cells(player, self._n - 1)
+
+    def _four_cells(self, player):
+        """Cells making a four (a winning cell) for player"""
+        return self._empty_cells(player, self._n - 2)
+
+    def _open_four_cells(self, player):
+        """Cells making two or more winning cells for player at once"""
+        cells = []
+        for c in sorted(self._four_cells(player)):
+            self._place(c, player)
+            if len(self._win_cells(player)) >= 2:
+                cells.append(c)
+            self._remove(c, player)
+        return cells
+
+    def _threat_moves(self, player, use_threes):
+        """Moves making a four, then (with use_threes) moves making an open three"""
+        fours = sorted(self._four_cells(player))
+        if not use_threes or self._n < 3:
+            return fours
+        threes = []
+        for c in sorted(self._empty_cells(player, self._n - 3) - set(fours)):
+            self._place(c, player)
+            if self._open_four_cells(player):
+                threes.append(c)
+            self._remove(c, player)
+        return fours + threes
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise _BudgetExceeded
+
+    def _attack(self, attacker, depth, use_threes):
+        """
+        Return the first move of a sequence of at most depth threats winning for attacker
+        (the player to move), or None if there is none.
+        """
+        self._count_node()
+        defender = 3 - attacker
+        wins = self._win_cells(attacker)
+        if wins:
+            return min(wins)
+        if depth == 0:
+            return None
+        blocks = self._win_cells(defender)
+        threats = self._threat_moves(attacker, use_threes)
+        if blocks:
+            # the four of the defender has to be blocked, which only keeps the initiative if it is a threat too
+            threats = [c for c in threats if c in blocks] if len(blocks) == 1 else []
+        for move in threats:
+            self._place(move, attacker)
+            win = self._defend(attacker, depth - 1, use_threes)
+            self._remove(move, attacker)
+            if win:
+                return move
+        return None
+
+    def _defend(self, attacker, depth, use_threes):
+        """Whether attacker wins against every defence against its last threat"""
+        self._count_node()
+        defender = 3 - attacker
+        if self._win_cells(defender):
+            return False
+        wins = self._win_cells(attacker)
+        if len(wins) >= 2:
+            return True
+        if wins:
+            replies = wins
+        else:
+            # a defence against an open three has to take one of the cells of the open fours,
+            # or a winning cell of one of them, unless the defender makes a four of his own
+            open_fours = self._open_four_cells(attacker)
+            if not open_fours:
+                return False
+            replies = set(open_fours) | self._four_cells(defender)
+            for c in open_fours:
+                self._place(c, attacker)
+                replies |= self._win_cells(attacker)
+                self._remove(c, attacker)
+        for reply in sorted(replies):
+            self._place(reply, defender)
+            win = self._attack(attacker, depth, use_threes) is not None
+            self._remove(reply, defender)
+            if not win:
+                return False
+        return True
@@ -0,0 +1,91 @@
+import numpy as np
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable(object):
+    """
+    A fixed-size hash table of search results, indexed by the Zobrist hash of the position.
+    Each entry keeps the search depth, the bound type of the value (EXACT, LOWER or UPPER),
+    the value and the best move found.
+    """
+    # bytes per entry: key, value, depth, move, bound type and generation
+    ENTRY_SIZE = 8 + 8 + 2 + 2 + 1 + 1
+
+    def __init__(self, size_mb=16):
+        """
+        Parameters:
+            size_mb: memory cap of the table in megabytes, the number of entries is
+                the largest power of two fitting in it.
+        """
+        n_entries = max(1, int(size_mb * (1 << 20)) // self.ENTRY_SIZE)
+        self.size = 1 << (n_entries.bit_length() - 1)
+        self._mask = self.size - 1
+        self._keys = np.zeros(self.size, dtype=np.uint64)
+        self._values = np.zeros(self.size, dtype=np.float64)
+        self._depths = np.full(self.size, -1, dtype=np.int16)  # -1 for an empty entry
+        self._moves = np.full(self.size, -1, dtype=np.int16)
+        self._flags = np.zeros(self.size, dtype=np.uint8)
+        self._generations = np.zeros(self.size, dtype=np.uint8)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        # count the probes and hits
+        self.counting = True
+
+    def new_search(self):
+        """Start a new search, entries of the previous searches are replaced first."""
+        self.generation = (self.generation + 1) & 0xff
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self._depths.fill(-1)
+        self.probes = 0
+        self.hits = 0
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def probe(self, key):
+        """
+        Look up the position with the given hash.
+
+        Return:
+            Tuple(depth, flag, value, move) of the stored entry, or None if not found.
+        """
+        if self.counting:
+            self.probes += 1
+        i = key & self._mask
+        depth = int(self._depths[i])
+        if depth < 0 or int(self._keys[i]) != key:
+            return None
+        if self.counting:
+            self.hits += 1
+        return depth, int(self._flags[i]), float(self._values[i]), int(self._moves[i])
+
+    def store(self, key, depth, flag, value, move):
+        """
+        Store a search result. An entry of the current search is only replaced
+        by a search at least as deep, entries of previous searches are always replaced.
+        """
+        i = key & self._mask
+        if depth < self._depths[i] and self._generations[i] == self.generation:
+            return
+        self._keys[i] = key
+        self._depths[i] = depth
+        self._flags[i] = flag
+        self._values[i] = value
+        self._moves[i] = -1 if move is None else move
+        self._generations[i] = self.generation
+
+
+def tt_move_first(actions, tt_move):
+    """Iterate over actions, starting with the move stored in the transposition table (if valid)."""
+    if tt_move is None or tt_move < 0 or tt_move not in actions:
+        yield from actions
+        return
+    yield tt_move
+    for action in actions:
+        if action != tt_move:
+            yield action
@@ -0,0 +1,98 @@
+from __future__ import print_function
+
+import random
+import shlex
+import sys
+import multiprocessing
+
+import numpy as np
+from game import CLIGame
+from play import get_board, get_parser, get_player, parse_args
+from utils.records import GameRecordWriter
+
+
+def play_game(task):
+    """
+    Play one self-play game without showing it, in a worker process.
+
+    Parameters:
+        task: Tuple(start_player, seed, args_1, args_2), 0 for player 1 first (1 for player 2 first),
+            the seed of the game and the arguments of the two players.
+
+    Return:
+        Tuple(moves, first, winner, visits), as taken by GameRecordWriter.write.
+    """
+    start_player, seed, args_1, args_2 = task
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    board = get_board(args_1.board, width=args_1.width, height=args_1.height, n_in_row=args_1.n_in_row,
+                      candidate_distance=args_1.candidate_distance)
+    game = CLIGame(board)
+    players = [get_player(args.player, args) for args in (args_1, args_2)]
+    try:
+        winner = game.start_play(players[0], players[1], start_player=start_player, is_shown=0)
+    finally:
+        for player in players:
+            player.close()
+    return game.moves, start_player + 1, winner, game.move_visits
+
+
+def run(args, player_args):
+    """
+    Play args.games games between the players of player_args over a pool of processes, alternating the first
+    player, and append them to shards of args.shard_games games as they end.
+    """
+    args_1, args_2 = player_args if len(player_args) == 2 else player_args * 2
+    rng = random.Random(args.seed)
+    # generated lazily, so that the tasks of millions of games are not all held in memory
+    tasks = ((k % 2, rng.getrandbits(63), args_1, args_2) for k in range(args.games))
+    pool = multiprocessing.Pool(args.processes)
+    writer = None
+    n_games, n_positions, wins = 0, 0, {1: 0, 2: 0, -1: 0}
+    try:
+        for moves, first, winner, visits in pool.imap_unordered(play_game, tasks):
+            if n_games % args.shard_games == 0:
+                if writer is not None:
+                    writer.close()
+                path = "{}-{:05d}.bin".format(args.output, n_games // args.shard_games)
+                # the games are played on the board of the config of player 1
+                writer = GameRecordWriter(path, args_1.width, args_1.height, args_1.n_in_row, args.visits)
+            writer.write(moves, first, winner, visits)
+            n_games += 1
+            n_positions += len(moves)
+            wins[winner] += 1
+            if n_games % 100 == 0 or n_games == args.games:
+                print("{}/{} games, {} positions, player 1/player 2/tie: {}/{}/{}".format(
+                    n_games, args.games, n_positions, wins[1], wins[2], wins[-1]))
+    finally:
+        pool.terminate()
+        if writer is not None:
+            writer.close()
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    parser.add_argument("--players", type=str, nargs="+", required=True,
+                        help="One player config playing both sides, or the configs of player 1 and 2, each a player name "
+                             "followed by its arguments, e.g. \"MCTSPlayer --n_playout 1000\".")
+    parser.add_argument("--games", type=int, default=1000, help="Number of games.")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="Number of games played at once, each in its own process (players with --workers > 1 cannot run in them).")
+    parser.add_argument("--output", type=str, default="selfplay", help="Prefix of the shard files, numbered from 0.")
+    parser.add_argument("--shard_games", type=int, default=10000, help="Number of games per shard.")
+    parser.add_argument("--visits", action="store_true", help="Store the visits of the root children of every move (MCTS/AlphaZero only).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the games.")
+    args = parse_args(parser)
+    if len(args.players) > 2:
+        parser.error("--players takes one or two configs")
+    player_args = []
+    for config in args.players:
+        name, *tokens = shlex.split(config)
+        # the arguments of a config come after the shared ones, so they take precedence
+        config_args = parse_args(parser, sys.argv[1:] + tokens)
+        config_args.player = name
+        player_args.append(config_args)
+    if len(set((a.width, a.height, a.n_in_row) for a in player_args)) > 1:
+        parser.error("the configs of --players must play on the same board (--width, --height, --n_in_row)")
+    if any(a.ponder for a in player_args):
+        parser.error("--ponder is only supported against a human (play.py)")
+    run(args, player_args)
@@ -1,2 +1,4 @@
 from .state import *
+from .patterns import *
 from .board import *
+from .bitboard import *
@@ -0,0 +1,227 @@
+import copy
+import numpy as np
+from .state import State
+from .zobrist import get_zobrist_keys
+from .board import Board
+
+class BitBoard(State):
+    """board for the game, storing the pieces of each player as a packed bitboard"""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.width = int(kwargs.get('width', 8))
+        self.height = int(kwargs.get('height', 8))
+        # bit h * (width + 1) + w is set when (h, w) holds a piece,
+        # the extra padding column stops lines from wrapping around
+        self._stride = self.width + 1
+        # bitboards of the players, indexed by player - 1
+        self._bits = [0, 0]
+        # need how many pieces in a row to win
+        self._n_in_row = int(kwargs.get('n_in_row', 5))
+        self._shifts = (1, self._stride, self._stride + 1, self._stride - 1)
+        # bits of the cells on the board, excluding the padding column
+        self._mask = sum(((1 << self.width) - 1) << (h * self._stride) for h in range(self.height))
+        # candidate actions are the empty cells within this distance of a piece
+        self._candidate_distance = int(kwargs.get('candidate_distance', 2))
+        self._availables, self._last_move = None, None
+        self._winner = -1
+        # Zobrist hash of the position, updated on every perform/cancel action
+        self._zobrist_keys, self._zobrist_side = get_zobrist_keys(self.width * self.height)
+        self._hash = 0
+
+    @property
+    def n_in_row(self):
+        return self._n_in_row
+
+    def move_to_location(self, move):
+        h = move // self.width
+        w = move % self.width
+        return [h, w]
+
+    def location_to_move(self, location):
+        if len(location) != 2:
+            return -1
+        h = location[0]
+        w = location[1]
+        move = h * self.width + w
+        if move not in range(self.width * self.height):
+            return -1
+        return move
+
+    def _bit(self, move):
+        return 1 << (move // self.width * self._stride + move % self.width)
+
+    @property
+    def _states(self):
+        """board states as a dict from move to player, like Board._states"""
+        states = {}
+        for p in self._players:
+            bits = self._bits[p - 1]
+            while bits:
+                low = bits & -bits
+                index = low.bit_length() - 1
+                states[index // self._stride * self.width + index % self._stride] = p
+                bits ^= low
+        return states
+
+    def reset(self, start_player=0):
+        if self.width < self._n_in_row or self.height < self._n_in_row:
+            raise Exception('board width and height can not be '
+                            'less than {}'.format(self._n_in_row))
+        self._current_player = self._players[start_player]  # start player
+        # keep available moves in a list, together with the position of each move in it
+        self._availables = list(range(self.width * self.height))
+        self._available_index = list(range(self.width * self.height))
+        self._bits = [0, 0]
+        self._last_move = -1
+        self._winner = -1
+        self._hash = self._zobrist_side if start_player else 0
+        # stack of (move, position in availables, winner before the move)
+        self._history = []
+
+    @property
+    def can_cancel(self):
+        return len(self._history) > 0
+
+    def clone(self):
+        state = copy.copy(self)
+        state._bits = list(self._bits)
+        state._availables = list(self._availables)
+        state._available_index = list(self._available_index)
+        state._history = list(self._history)
+        return state
+
+    def get_current_player(self):
+        return self._current_player
+
+    def get_last_move(self):
+        return self._last_move
+
+    def get_hash(self):
+        return self._hash
+
+    def get_all_actions(self):
+        return self._availables
+
+    def get_candidate_actions(self):
+        """
+        Empty cells within candidate_distance of any piece, found by dilating the pieces
+        one step in the eight directions at a time. All available actions are returned
+        when the board is empty or no such cell is left.
+        """
+        occupied = self._bits[0] | self._bits[1]
+        near = occupied
+        for _ in range(self._candidate_distance):
+            step = near
+            for shift in self._shifts:
+                step |= (near << shift) | (near >> shift)
+            near = step & self._mask
+        near &= ~occupied
+        if not near:
+            return self._availables
+        candidates = []
+        while near:
+            low = near & -near
+            index = low.bit_length() - 1
+            candidates.append(index // self._stride * self.width + index % self._stride)
+            near ^= low
+        return candidates
+
+    def perform_action(self, action):
+        availables, index = self._availables, self._available_index
+        i = index[action]
+        last = availables.pop()
+        if last != action:
+            availables[i] = last
+            index[last] = i
+        self._history.append((action, i, self._winner))
+        player = self._current_player - 1
+        self._bits[player] |= self._bit(action)
+        if self._winner == -1 and self._has_n_in_row(self._bits[player]):
+            self._winner = self._current_player
+        self._hash ^= self._zobrist_keys[self._current_player - 1][action] ^ self._zobrist_side
+        self._current_player = (
+            self._players[0] if self._current_player == self._players[1]
+            else self._players[1]
+        )
+        self._last_move = action
+        return self
+
+    def cancel_action(self):
+        if self._history:
+            action, i, self._winner = self._history.pop()
+            self._current_player = (
+                self._players[0] if self._current_player == self._players[1]
+                else self._players[1]
+            )
+            availables, index = self._availables, self._available_index
+            if i < len(availables):
+                moved = availables[i]
+                availables.append(moved)
+                index[moved] = len(availables) - 1
+                availables[i] = action
+            else:
+                availables.append(action)
+            index[action] = i
+            self._hash ^= self._zobrist_keys[self._current_player - 1][action] ^ self._zobrist_side
+            self._bits[self._current_player - 1] &= ~self._bit(action)
+            self._last_move = self._history[-1][0] if self._history else -1
+        return self
+
+    def _has_n_in_row(self, bits):
+        """Check for n pieces in a row with shift-and-AND along the four directions"""
+        for shift in self._shifts:
+            run = bits
+            for k in range(1, self._n_in_row):
+                run &= bits >> (k * shift)
+                if not run:
+                    break
+            if run:
+                return True
+        return False
+
+    def get_line_lengths(self, move, player):
+        """
+        Lengths of the lines of player's pieces through move in the four directions, counting move itself
+        and at most n_in_row - 1 pieces on each side.
+        """
+        bits = self._bits[player - 1]
+        index = move // self.width * self._stride + move % self.width
+        lengths = []
+        for shift in self._shifts:
+            count = 1
+            for k in range(1, self._n_in_row):
+                if not bits >> (index + k * shift) & 1:
+                    break
+                count += 1
+            for k in range(1, self._n_in_row):
+                if index < k * shift or not bits >> (index - k * shift) & 1:
+                    break
+                count += 1
+            lengths.append(count)
+        return lengths
+
+    def has_a_winner(self):
+        return self._winner != -1, self._winner
+
+    def game_end(self):
+        """Check whether the game is ended or not"""
+        win, winner = self.has_a_winner()
+        if win:
+            return True, winner
+        elif not len(self._availables):
+            return True, -1
+        return False, -1
+
+    def get_board_array(self):
+        """The board as an array of shape (height, width), 0 for empty cells"""
+        n_bytes = (self.height * self._stride + 7) // 8
+        board = np.zeros((self.height, self._stride), dtype=np.int8)
+        for p in self._players:
+            bits = np.unpackbits(np.frombuffer(self._bits[p - 1].to_bytes(n_bytes, 'little'), dtype=np.uint8),
+                                 count=self.height * self._stride, bitorder='little')
+            board[bits.reshape(self.height, self._stride) == 1] = p
+        return board[:, :self.width]
+
+    compute_info = Board.compute_info
+    get_info = Board.compute_info
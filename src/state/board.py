@@ -1,5 +1,21 @@
+import copy
+import functools
 import numpy as np
 from .state import State
+from .zobrist import get_zobrist_keys
+from .patterns import PATTERN_NAMES, get_lines, line_pattern_counts, get_info_batch
+
+
+@functools.lru_cache(maxsize=None)
+def _get_neighbours(width, height, distance):
+    """Cells within distance of each cell of a width x height board, the cell itself excluded"""
+    return [
+        [i * width + j
+         for i in range(max(0, h - distance), min(height, h + distance + 1))
+         for j in range(max(0, w - distance), min(width, w + distance + 1))
+         if (i, j) != (h, w)]
+        for h in range(height) for w in range(width)
+    ]
 
 class Board(State):
     """board for the game"""
@@ -14,7 +30,45 @@ class Board(State):
         self._states = {}
         # need how many pieces in a row to win
         self._n_in_row = int(kwargs.get('n_in_row', 5))
+        # only check the lines through the last move for a winner,
+        # the result is cached until the next perform/cancel action
+        self._incremental_win = bool(kwargs.get('incremental_win', True))
+        # candidate actions are the empty cells within this distance of a piece
+        self._candidate_distance = int(kwargs.get('candidate_distance', 2))
+        self._neighbours = None
         self._availables, self._last_move = None, None
+        self._winner = -1
+        # Zobrist hash of the position, updated on every perform/cancel action
+        self._zobrist_keys, self._zobrist_side = get_zobrist_keys(self.width * self.height)
+        self._hash = 0
+        # every line of the board is kept as a span of a byte buffer (b'0' for empty cells),
+        # the pattern counts of a line are only recomputed after one of its cells changed
+        self._line_spans, self._cell_lines, offset = [], [[] for _ in range(self.width * self.height)], 0
+        for line_id, line in enumerate(get_lines(self.width, self.height)):
+            self._line_spans.append((offset, offset + len(line)))
+            for move in line:
+                self._cell_lines[move].append((line_id, offset))
+                offset += 1
+        self._line_buffer_size = offset
+        # cells within n_in_row - 1 steps forward and backward from every cell in the four directions
+        self._rays = [[(self._ray(h, w, dh, dw), self._ray(h, w, -dh, -dw))
+                       for dh, dw in ((0, 1), (1, 0), (1, 1), (1, -1))]
+                      for h in range(self.height) for w in range(self.width)]
+        self._distances = [abs(m // self.width - (self.height - 1) / 2) + abs(m % self.width - (self.width - 1) / 2)
+                           for m in range(self.width * self.height)]
+
+    def _ray(self, h, w, dh, dw):
+        ray = []
+        for k in range(1, self._n_in_row):
+            i, j = h + k * dh, w + k * dw
+            if not (0 <= i < self.height and 0 <= j < self.width):
+                break
+            ray.append(i * self.width + j)
+        return tuple(ray)
+
+    @property
+    def n_in_row(self):
+        return self._n_in_row
 
     def move_to_location(self, move):
         h = move // self.width
@@ -36,11 +90,44 @@ class Board(State):
             raise Exception('board width and height can not be '
                             'less than {}'.format(self._n_in_row))
         self._current_player = self._players[start_player]  # start player
-        # keep available moves in a list
+        # keep available moves in a list, together with the position of
+        # each move in it, so that a move is removed by swapping with the last one
         self._availables = list(range(self.width * self.height))
+        self._available_index = list(range(self.width * self.height))
         self._states = {}
         self._last_move = -1
-        self.can_cancel = False
+        self._winner = -1
+        self._hash = self._zobrist_side if start_player else 0
+        self._line_buffer = bytearray(b'0' * self._line_buffer_size)
+        self._line_counts = [line_pattern_counts(b'0')] * len(self._line_spans)
+        self._dirty_lines = set()
+        self._pattern_counts = [[0] * len(PATTERN_NAMES), [0] * len(PATTERN_NAMES)]
+        self._max_distance = [0., 0.]
+        # stack of (move, position in availables, winner and max distance of the player before the move)
+        self._history = []
+        # number of pieces near each cell and the set of candidate actions,
+        # only maintained after the first call of get_candidate_actions
+        self._candidate_counts, self._candidates = None, None
+
+    @property
+    def can_cancel(self):
+        return len(self._history) > 0
+
+    def clone(self):
+        state = copy.copy(self)
+        state._states = dict(self._states)
+        state._availables = list(self._availables)
+        state._available_index = list(self._available_index)
+        state._history = list(self._history)
+        state._line_buffer = bytearray(self._line_buffer)
+        state._line_counts = list(self._line_counts)
+        state._dirty_lines = set(self._dirty_lines)
+        state._pattern_counts = [list(counts) for counts in self._pattern_counts]
+        state._max_distance = list(self._max_distance)
+        if self._candidates is not None:
+            state._candidate_counts = list(self._candidate_counts)
+            state._candidates = set(self._candidates)
+        return state
 
     def get_current_player(self):
         return self._current_player
@@ -48,32 +135,129 @@ class Board(State):
     def get_last_move(self):
         return self._last_move
 
+    def get_hash(self):
+        return self._hash
+
     def get_all_actions(self):
         return self._availables
 
+    def get_candidate_actions(self):
+        """
+        Empty cells within candidate_distance of any piece. All available actions
+        are returned when the board is empty or no such cell is left.
+        """
+        if self._candidates is None:
+            self._init_candidates()
+        if not self._candidates:
+            return self._availables
+        return list(self._candidates)
+
+    def _init_candidates(self):
+        if self._neighbours is None:
+            self._neighbours = _get_neighbours(self.width, self.height, self._candidate_distance)
+        self._candidate_counts = [0] * (self.width * self.height)
+        for move in self._states:
+            for neighbour in self._neighbours[move]:
+                self._candidate_counts[neighbour] += 1
+        self._candidates = set(m for m in self._availables if self._candidate_counts[m] > 0)
+
     def perform_action(self, action):
-        self._states[action] = self._current_player
-        self._availables.remove(action)
+        availables, index = self._availables, self._available_index
+        i = index[action]
+        last = availables.pop()
+        if last != action:
+            availables[i] = last
+            index[last] = i
+        player = self._current_player
+        self._history.append((action, i, self._winner, self._max_distance[player - 1]))
+        self._states[action] = player
+        for line_id, pos in self._cell_lines[action]:
+            self._line_buffer[pos] = 48 + player  # b'1' or b'2'
+            self._dirty_lines.add(line_id)
+        self._max_distance[player - 1] = max(self._max_distance[player - 1], self._distances[action])
+        if self._candidates is not None:
+            counts, candidates, states = self._candidate_counts, self._candidates, self._states
+            candidates.discard(action)
+            for neighbour in self._neighbours[action]:
+                counts[neighbour] += 1
+                if neighbour not in states:
+                    candidates.add(neighbour)
+        if self._incremental_win:
+            if self._winner == -1 and self.count_in_row(action) >= self._n_in_row:
+                self._winner = self._current_player
+        self._hash ^= self._zobrist_keys[self._current_player - 1][action] ^ self._zobrist_side
         self._current_player = (
             self._players[0] if self._current_player == self._players[1]
             else self._players[1]
         )
         self._last_move = action
-        self.can_cancel = True
         return self
 
     def cancel_action(self):
-        if self.can_cancel:
+        if self._history:
+            action, i, self._winner, max_distance = self._history.pop()
             self._current_player = (
                 self._players[0] if self._current_player == self._players[1]
                 else self._players[1]
             )
-            self._availables.append(self._last_move)
-            del self._states[self._last_move]
-            self.can_cancel = False
+            self._max_distance[self._current_player - 1] = max_distance
+            for line_id, pos in self._cell_lines[action]:
+                self._line_buffer[pos] = 48
+                self._dirty_lines.add(line_id)
+            # put the move back to its original position in availables
+            availables, index = self._availables, self._available_index
+            if i < len(availables):
+                moved = availables[i]
+                availables.append(moved)
+                index[moved] = len(availables) - 1
+                availables[i] = action
+            else:
+                availables.append(action)
+            index[action] = i
+            self._hash ^= self._zobrist_keys[self._current_player - 1][action] ^ self._zobrist_side
+            del self._states[action]
+            if self._candidates is not None:
+                counts, candidates = self._candidate_counts, self._candidates
+                for neighbour in self._neighbours[action]:
+                    counts[neighbour] -= 1
+                    if counts[neighbour] == 0:
+                        candidates.discard(neighbour)
+                if counts[action] > 0:
+                    candidates.add(action)
+            self._last_move = self._history[-1][0] if self._history else -1
         return self
 
+    def count_in_row(self, move):
+        """Length of the longest line of same-colored pieces passing through move"""
+        player = self._states.get(move)
+        if player is None:
+            return 0
+        return max(self.get_line_lengths(move, player))
+
+    def get_line_lengths(self, move, player):
+        """
+        Lengths of the lines of player's pieces through move in the four directions, counting move itself
+        and at most n_in_row - 1 pieces on each side.
+        """
+        states = self._states
+        lengths = []
+        for forward, backward in self._rays[move]:
+            count = 1
+            for m in forward:
+                if states.get(m) != player:
+                    break
+                count += 1
+            for m in backward:
+                if states.get(m) != player:
+                    break
+                count += 1
+            lengths.append(count)
+        return lengths
+
     def has_a_winner(self):
+        if self._incremental_win:
+            return self._winner != -1, self._winner
+
         width = self.width
         height = self.height
         states = self._states
@@ -115,91 +299,42 @@ class Board(State):
             return True, -1
         return False, -1
 
-    def get_info(self):
-        info_dict = {
-            "live_four": [
-                np.array([0, 1, 1, 1, 1, 0]),
-            ],
-            "four": [
-                np.array([0, 1, 1, 1, 1]),
-                np.array([0, 1, 1, 1, 0, 1]),
-                np.array([0, 1, 1, 0, 1, 1]),
-                np.array([0, 1, 0, 1, 1, 1]),
-                np.array([1, 1, 1, 1, 0]),
-                np.array([1, 0, 1, 1, 1, 0]),
-                np.array([1, 1, 0, 1, 1, 0]),
-                np.array([1, 1, 1, 0, 1, 0]),
-            ],
-            "live_three": [
-                np.array([0, 1, 1, 1, 0]),
-                np.array([0, 1, 1, 0, 1, 0]),
-                np.array([0, 1, 0, 1, 1, 0]),
-            ],
-            "three": [
-                np.array([0, 1, 1, 1]),
-                np.array([0, 1, 1, 0, 1]),
-                np.array([0, 1, 0, 1, 1]),
-                np.array([1, 1, 1, 0]),
-                np.array([1, 1, 0, 1, 0]),
-                np.array([1, 0, 1, 1, 0]),
-            ],
-            "live_two": [
-                np.array([0, 1, 1, 0]),
-                np.array([0, 1, 0, 1, 0]),
-            ],
-        }
-
-        state = np.zeros((self.width, self.height))
-        if len(self._states) > 0:
-            moves, players = np.array(list(zip(*self._states.items())))
-            state[moves // self.width, moves % self.height] = players
-
-        all_state = -np.ones((4, 6, self.width, self.height))
-        all_state[0, 0] = state
-        all_state[1, 0] = state
-        all_state[2, 0] = state
-        all_state[3, 0] = state
-        for i in range(1, 6):
-            all_state[0, i, :-i, :] = state[i:, :]
-            all_state[1, i, :, :-i] = state[:, i:]
-            all_state[2, i, :-i, :-i] = state[i:, i:]
-            all_state[3, i, :-i, i:] = state[i:, :-i]
+    def _update_pattern_counts(self):
+        """Recount the patterns of the lines changed since the last call"""
+        buffer, spans, line_counts, totals = self._line_buffer, self._line_spans, self._line_counts, self._pattern_counts
+        for line_id in self._dirty_lines:
+            start, end = spans[line_id]
+            counts = line_pattern_counts(bytes(buffer[start:end]))
+            old_counts = line_counts[line_id]
+            if counts is not old_counts:
+                for total, new, old in zip(totals, counts, old_counts):
+                    for k in range(len(total)):
+                        total[k] += new[k] - old[k]
+                line_counts[line_id] = counts
+        self._dirty_lines.clear()
 
+    def get_info(self):
+        """
+        Pattern counts and normalized max distance to the center of each player,
+        maintained incrementally over the lines changed by perform/cancel action.
+        """
+        self._update_pattern_counts()
+        norm = (self.height - 1) / 2 + (self.width - 1) / 2
         info = {}
-
         for player in self._players:
-            info[player] = {}
-            occupied = np.zeros((4, 6, self.width, self.height), dtype=bool)
-            for shape_name, shape_list in info_dict.items():
-                info[player][shape_name] = 0
-                for shape in shape_list:
-                    match = np.all((~occupied[:, :len(shape), :, :]) & (all_state[:, :len(shape), :, :] == player * shape[None, :, None, None]), axis=1)
-                    info[player][shape_name] += match.sum()
-                    for d, w_0, h_0 in np.transpose(match.nonzero()):
-                        for j in range(len(shape)):
-                            if d == 0:
-                                w, h = w_0 + j, h_0
-                            elif d == 1:
-                                w, h = w_0, h_0 + j
-                            elif d == 2:
-                                w, h = w_0 + j, h_0 + j
-                            else:
-                                w, h = w_0 + j, h_0 - j
-                            for i in range(6):
-                                if d == 0 and w >= i:
-                                    occupied[0, i, w - i, h] = 1
-                                if d == 1 and h >= i:
-                                    occupied[1, i, w, h - i] = 1
-                                if d == 2 and w >= i and h >= i:
-                                    occupied[2, i, w - i, h - i] = 1
-                                if d == 3 and w >= i and h + i < self.height:
-                                    occupied[3, i, w - i, h + i] = 1
-            max_distance = max([0.] + [abs(location // self.width - (self.height - 1) / 2)
-                                       + abs(location % self.width - (self.width - 1) / 2)
-                                       for location in self._states.keys() if
-                                       self._states.get(location, 0) == player])
-            max_distance /= ((self.height - 1) / 2 + (self.width - 1) / 2)
-            info[player]["max_distance"] = max_distance
-
+            info[player] = dict(zip(PATTERN_NAMES, self._pattern_counts[player - 1]))
+            info[player]["max_distance"] = self._max_distance[player - 1] / norm
         return info
 
+    def get_board_array(self):
+        """The board as an array of shape (height, width), 0 for empty cells"""
+        board = np.zeros((self.height, self.width), dtype=np.int8)
+        if len(self._states) > 0:
+            board.flat[list(self._states.keys())] = list(self._states.values())
+        return board
+
+    def compute_info(self):
+        """Compute the same info as get_info from scratch"""
+        info = get_info_batch(self.get_board_array())
+        return {player: {name: values[0].item() for name, values in info_p.items()}
+                for player, info_p in info.items()}
@@ -0,0 +1,203 @@
+"""
+Patterns counted by State.get_info, and their counting along a single line of the board
+or over whole boards with NumPy
+"""
+import functools
+import numpy as np
+
+# shape families in matching order, 1 for a piece of the player and 0 for an empty cell.
+# A cell matched by a shape is not used again by later shapes in the same direction.
+PATTERNS = (
+    ("live_four", (
+        (0, 1, 1, 1, 1, 0),
+    )),
+    ("four", (
+        (0, 1, 1, 1, 1),
+        (0, 1, 1, 1, 0, 1),
+        (0, 1, 1, 0, 1, 1),
+        (0, 1, 0, 1, 1, 1),
+        (1, 1, 1, 1, 0),
+        (1, 0, 1, 1, 1, 0),
+        (1, 1, 0, 1, 1, 0),
+        (1, 1, 1, 0, 1, 0),
+    )),
+    ("live_three", (
+        (0, 1, 1, 1, 0),
+        (0, 1, 1, 0, 1, 0),
+        (0, 1, 0, 1, 1, 0),
+    )),
+    ("three", (
+        (0, 1, 1, 1),
+        (0, 1, 1, 0, 1),
+        (0, 1, 0, 1, 1),
+        (1, 1, 1, 0),
+        (1, 1, 0, 1, 0),
+        (1, 0, 1, 1, 0),
+    )),
+    ("live_two", (
+        (0, 1, 1, 0),
+        (0, 1, 0, 1, 0),
+    )),
+)
+PATTERN_NAMES = tuple(name for name, _ in PATTERNS)
+
+# directions of the lines as (step of row, step of column)
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+_BYTE_PATTERNS = tuple(tuple(bytes(b'01'[c] for c in shape) for shape in shapes)
+                       for _, shapes in PATTERNS)
+_SWAP_PLAYERS = bytes.maketrans(b'12', b'21')
+_MAX_SHAPE_LEN = max(len(shape) for _, shapes in PATTERNS for shape in shapes)
+# shapes as base-3 codes of their cells (0 empty, 1 own piece, 2 blocked), first cell lowest
+_POWERS = [3 ** i for i in range(_MAX_SHAPE_LEN)]
+# family of every shape in matching order, and the offsets of its cells from the start of a window
+# (shorter shapes repeat their first cell, which does not change the cells checked or marked)
+_SHAPE_FAMILIES = np.array([f for f, (_, shapes) in enumerate(PATTERNS) for _ in shapes])
+_SHAPE_OFFSETS = np.array([list(range(len(shape))) + [0] * (_MAX_SHAPE_LEN - len(shape))
+                           for _, shapes in PATTERNS for shape in shapes])
+# cell codes in the view of player 1 and player 2, indexed by the board value (-1 for off board)
+_VIEWS = np.array([[0, 1, 2, 2], [0, 2, 1, 2]], dtype=np.int16)
+# bit j of _SHAPE_TABLE[code] is set when the j-th shape matches the beginning of a window with the code
+_SHAPE_TABLE = np.zeros(3 ** _MAX_SHAPE_LEN, dtype=np.int64)
+for _j, _shape in enumerate(shape for _, shapes in PATTERNS for shape in shapes):
+    _code = sum(c * p for c, p in zip(_shape, _POWERS))
+    _SHAPE_TABLE[np.arange(3 ** _MAX_SHAPE_LEN) % 3 ** len(_shape) == _code] |= 1 << _j
+
+
+def get_lines(width, height):
+    """
+    All lines of a width x height board along the four directions.
+
+    Return:
+        List of lines, each a list of moves from one edge of the board to the other.
+    """
+    lines = []
+    for dh, dw in DIRECTIONS:
+        for h in range(height):
+            for w in range(width):
+                if 0 <= h - dh < height and 0 <= w - dw < width:
+                    continue  # not the first cell of a line
+                line = []
+                i, j = h, w
+                while 0 <= i < height and 0 <= j < width:
+                    line.append(i * width + j)
+                    i, j = i + dh, j + dw
+                lines.append(line)
+    return lines
+
+
+def _count_patterns(line):
+    counts = []
+    occupied = bytearray(len(line))
+    for shapes in _BYTE_PATTERNS:
+        count = 0
+        for shape in shapes:
+            n = len(shape)
+            starts = []
+            s = line.find(shape)
+            while s >= 0:
+                if not any(occupied[s:s + n]):
+                    starts.append(s)
+                s = line.find(shape, s + 1)
+            for s in starts:
+                occupied[s:s + n] = b'\x01' * n
+            count += len(starts)
+        counts.append(count)
+    return tuple(counts)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def line_pattern_counts(line):
+    """
+    Count the patterns along one line.
+
+    Parameters:
+        line: bytes of the line, b'0' for an empty cell and b'1'/b'2' for the pieces of player 1/2.
+
+    Return:
+        Tuple of the counts for player 1 and player 2, each a tuple ordered as PATTERN_NAMES.
+    """
+    return _count_patterns(line.replace(b'2', b'x')), \
+        _count_patterns(line.translate(_SWAP_PLAYERS).replace(b'2', b'x'))
+
+
+@functools.lru_cache(maxsize=None)
+def _line_index(width, height):
+    """
+    Index of the cells of all lines, one after another, into a flattened board.
+    Lines are separated by the index width * height (a blocked cell), so that a window
+    starting on a line never reaches the next one.
+    """
+    index = []
+    for line in get_lines(width, height):
+        index.extend(line)
+        index.extend([width * height] * (_MAX_SHAPE_LEN - 1))
+    distances = np.array([abs(m // width - (height - 1) / 2) + abs(m % width - (width - 1) / 2)
+                          for m in range(width * height)])
+    return np.array(index, dtype=np.intp), distances
+
+
+def get_info_batch(boards):
+    """
+    Compute State.get_info for a batch of boards at once.
+
+    All lines of a board are laid out in one row and every window of the row is encoded
+    as a number, so each shape is matched on all windows of all boards at once. The cells
+    of the matches are then propagated to an occupied mask, which stops later shapes
+    from using them again.
+
+    Parameters:
+        boards: array of shape (N, height, width) (or a single (height, width) board),
+            0 for an empty cell and 1/2 for the pieces of player 1/2.
+
+    Return:
+        Dict from player to a dict from pattern name and "max_distance" to arrays of shape (N,).
+    """
+    boards = np.asarray(boards)
+    if boards.ndim == 2:
+        boards = boards[None]
+    n, height, width = boards.shape
+    index, distances = _line_index(width, height)
+    flat = np.full((n, width * height + 1), -1, dtype=np.intp)
+    flat[:, :-1] = boards.reshape(n, -1)
+    # all lines of every board in the view of player 1, then in the view of player 2:
+    # 0 empty, 1 own piece, 2 blocked
+    cells = _VIEWS[:, flat[:, index]].reshape(2 * n, len(index))
+
+    # code of the window starting at each cell, combined from views of the cells shifted by 0..5,
+    # and the shapes matching at the start of it
+    n_rows, length = cells.shape
+    n_starts = length - _MAX_SHAPE_LEN + 1
+    pairs = cells[:, :-1] + 3 * cells[:, 1:]
+    quads = pairs[:, :-2] + 9 * pairs[:, 2:]
+    codes = quads[:, :n_starts] + 81 * pairs[:, 4:4 + n_starts]
+    shape_bits = _SHAPE_TABLE[codes]
+    windows = np.flatnonzero(shape_bits)
+    rows = windows // n_starts
+    # every (window, shape) match, grouped by shape in matching order
+    match_window, match_shape = np.nonzero(shape_bits.ravel()[windows, None] >> np.arange(len(_SHAPE_FAMILIES)) & 1)
+    order = np.argsort(match_shape, kind='stable')
+    match_window, match_shape = match_window[order], match_shape[order]
+    bounds = np.searchsorted(match_shape, np.arange(len(_SHAPE_FAMILIES) + 1)).tolist()
+    match_cells = (rows * length + windows % n_starts)[match_window, None] + _SHAPE_OFFSETS[match_shape]
+
+    # accept the matches shape by shape, matches on occupied cells are dropped
+    # and the cells of the others are marked as occupied
+    occupied = np.zeros(n_rows * length, dtype=bool)
+    accepted = np.zeros(len(match_shape), dtype=bool)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo == hi:
+            continue
+        free = ~occupied[match_cells[lo:hi]].any(axis=1)
+        accepted[lo:hi] = free
+        occupied[match_cells[lo:hi][free]] = True
+    counts = np.bincount(_SHAPE_FAMILIES[match_shape[accepted]] * n_rows + rows[match_window[accepted]],
+                         minlength=len(PATTERNS) * n_rows).reshape(len(PATTERNS), n_rows)
+    info = {1: {}, 2: {}}
+    for name, family_counts in zip(PATTERN_NAMES, counts):
+        info[1][name], info[2][name] = family_counts[:n], family_counts[n:]
+
+    norm = (height - 1) / 2 + (width - 1) / 2
+    stones = flat[:, None, :-1] == np.array([[1], [2]])
+    info[1]["max_distance"], info[2]["max_distance"] = (np.where(stones, distances, 0.).max(axis=2) / norm).T
+    return info
@@ -1,3 +1,4 @@
+import copy
 from typing import List, Tuple
 
 class State(object):
@@ -10,23 +11,42 @@ class State(object):
     def reset(self):
         raise NotImplementedError
 
+    def clone(self) -> 'State':
+        return copy.deepcopy(self)
+
     def get_current_player(self) -> int:
         raise NotImplementedError
 
     def get_all_actions(self) -> List:
         raise NotImplementedError
+
+    def get_candidate_actions(self) -> List:
+        """A subset of the actions worth searching, all actions by default."""
+        return self.get_all_actions()
     
     def get_last_move(self) -> int:
         raise NotImplementedError
 
+    def get_hash(self) -> int:
+        """A 64-bit key of the position, including the player to move."""
+        raise NotImplementedError
+
     def perform_action(self, action):
         raise NotImplementedError
     
     def cancel_action(self):
         raise NotImplementedError
 
+    def get_line_lengths(self, move, player) -> List[int]:
+        """Lengths of the lines of player's pieces through move in the four directions, counting move itself."""
+        raise NotImplementedError
+
     def game_end(self) -> Tuple[bool, int]:
         raise NotImplementedError
 
+    def get_board_array(self):
+        """The board as an array of shape (height, width), 0 for empty cells and players' pieces otherwise."""
+        raise NotImplementedError
+
     def get_info(self):
         return None
\ No newline at end of file
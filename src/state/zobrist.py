@@ -0,0 +1,21 @@
+import random
+
+_ZOBRIST_SEED = 20230519
+_zobrist_keys = {}
+
+
+def get_zobrist_keys(size):
+    """
+    Random 64-bit keys for Zobrist hashing of a board with size cells.
+
+    Return:
+        Tuple(piece_keys, side_key): piece_keys[player - 1][move] is xor-ed into the hash
+        when player puts a piece on move, side_key when the player to move changes.
+        The keys only depend on size, so hashes are reproducible across runs and processes.
+    """
+    if size not in _zobrist_keys:
+        rng = random.Random(_ZOBRIST_SEED + size)
+        piece_keys = ([rng.getrandbits(64) for _ in range(size)],
+                      [rng.getrandbits(64) for _ in range(size)])
+        _zobrist_keys[size] = (piece_keys, rng.getrandbits(64))
+    return _zobrist_keys[size]
@@ -0,0 +1,161 @@
+from __future__ import print_function
+
+import json
+import random
+import shlex
+import sys
+import multiprocessing
+
+import numpy as np
+from game import CLIGame
+from play import get_board, get_parser, get_player, parse_args, with_book
+from search import OpeningBook
+
+
+def play_game(task):
+    """
+    Play one game of a tournament without showing it, in a worker process.
+
+    Parameters:
+        task: Tuple(game, pairing, start_player, seed, args_1, args_2), the number of the game,
+            the indices (i, j) of the players, 0 for player i first (1 for player j first),
+            the seed of the game and the arguments of the two players.
+
+    Return:
+        The record of the game, as written to the JSONL file.
+    """
+    index, (i, j), start_player, seed, args_1, args_2 = task
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    board = get_board(args_1.board, width=args_1.width, height=args_1.height, n_in_row=args_1.n_in_row,
+                      candidate_distance=args_1.candidate_distance)
+    game = CLIGame(board)
+    players = [get_player(args.player, args) for args in (args_1, args_2)]
+    if args_1.book is not None:
+        book = OpeningBook(args_1.book)
+        players = [with_book(player, book) for player in players]
+    for player, args in zip(players, (args_1, args_2)):
+        player.set_profiling(args.profile)
+        player.set_stats(not args.no_search_stats)
+    try:
+        winner = game.start_play(players[0], players[1], start_player=start_player, is_shown=0)
+    finally:
+        for player in players:
+            player.close()
+    return {
+        "game": index,
+        "players": [i, j],
+        "names": [args_1.name, args_2.name],
+        "first": [i, j][start_player],
+        # the index of the winner, None for a tie
+        "winner": None if winner == -1 else [i, j][players[1].player == winner],
+        "moves": [int(move) for move in game.moves],
+        "move_times": [round(t, 6) for t in game.move_times],
+        # the statistics of the player making each move
+        "move_stats": game.move_stats,
+        "seed": seed,
+    }
+
+
+def elo_ratings(scores, n_games, n_iterations=1000):
+    """
+    Elo ratings of the players of a cross table, fitting the Bradley-Terry model by minorization-maximization.
+    Every pairing counts one more draw, so that the ratings stay finite when a player wins or loses all its games.
+
+    Parameters:
+        scores: scores[i, j] is the score of player i against player j, 1 per win and 0.5 per tie.
+        n_games: n_games[i, j] is the number of games between player i and player j.
+
+    Return:
+        Array of the ratings, with a mean of 0.
+    """
+    played = n_games > 0
+    scores = scores + 0.5 * played
+    n_games = n_games + played
+    gamma = np.ones(len(scores))
+    for _ in range(n_iterations):
+        gamma = scores.sum(axis=1) / (n_games / (gamma[:, None] + gamma[None, :])).sum(axis=1)
+        gamma /= np.exp(np.log(gamma).mean())
+    elo = 400 * np.log10(gamma)
+    return elo - elo.mean()
+
+
+def print_cross_table(names, scores, n_games):
+    """Print the score of each player against each other one, its total score and Elo rating"""
+    elo = elo_ratings(scores, n_games)
+    width = max(len("{:g}/{:d}".format(s, n)) for s, n in zip(scores.ravel(), n_games.ravel().tolist())) + 2
+    print("    " + "".join(str(j).rjust(width) for j in range(len(names))) + "     score     Elo")
+    for i in np.argsort(-elo):
+        cells = ["-" if i == j else "{:g}/{:d}".format(scores[i, j], n_games[i, j]) for j in range(len(names))]
+        total = "{:g}/{:d}".format(scores[i].sum(), n_games[i].sum())
+        print(str(i).rjust(4) + "".join(cell.rjust(width) for cell in cells) + total.rjust(10) +
+              "{:8.0f}".format(elo[i]))
+    print()
+    for i, name in enumerate(names):
+        print(str(i).rjust(4), name)
+
+
+def run(args, player_args):
+    """
+    Play args.games games between every two players of player_args over a pool of processes
+    (in this process with args.processes == 1), alternating the first player, and write the records
+    of the games to args.output as they end.
+    """
+    n_players = len(player_args)
+    tasks = []
+    rng = random.Random(args.seed)
+    for i in range(n_players):
+        for j in range(i + 1, n_players):
+            for k in range(args.games):
+                tasks.append((len(tasks), (i, j), k % 2, rng.getrandbits(63), player_args[i], player_args[j]))
+    scores = np.zeros((n_players, n_players))
+    n_games = np.zeros((n_players, n_players), dtype=int)
+    # the processes of a pool cannot start the worker processes of a player
+    pool = multiprocessing.Pool(args.processes) if args.processes > 1 else None
+    try:
+        with open(args.output, "w") as f:
+            for record in map(play_game, tasks) if pool is None else pool.imap_unordered(play_game, tasks):
+                f.write(json.dumps(record, default=lambda value: value.item()) + "\n")
+                f.flush()
+                i, j = record["players"]
+                n_games[i, j] += 1
+                n_games[j, i] += 1
+                if record["winner"] is None:
+                    scores[i, j] += 0.5
+                    scores[j, i] += 0.5
+                else:
+                    winner = record["winner"]
+                    scores[winner, i + j - winner] += 1
+                print("game {}/{}: {} vs {}, winner {}".format(
+                    int(n_games.sum()) // 2, len(tasks), i, j, "tie" if record["winner"] is None else winner))
+    finally:
+        if pool is not None:
+            pool.terminate()
+    print()
+    print_cross_table([args.name for args in player_args], scores, n_games)
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    parser.add_argument("--players", type=str, nargs="+", required=True,
+                        help="Player configs, each a player name followed by its arguments, "
+                             "e.g. \"MCTSPlayer --n_playout 1000\". The other arguments are shared by all players.")
+    parser.add_argument("--games", type=int, default=10, help="Number of games between every two players.")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="Number of games played at once, each in its own process. With 1, the games are played one after the other in this process, as players with --workers > 1 need.")
+    parser.add_argument("--output", type=str, default="tournament.jsonl", help="JSONL file of the game records.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the games.")
+    args = parse_args(parser)
+    player_args = []
+    for config in args.players:
+        name, *tokens = shlex.split(config)
+        # the arguments of a config come after the shared ones, so they take precedence
+        config_args = parse_args(parser, sys.argv[1:] + tokens)
+        config_args.player, config_args.name = name, config
+        player_args.append(config_args)
+    if len(set((a.width, a.height, a.n_in_row) for a in player_args)) > 1:
+        parser.error("the configs of --players must play on the same board (--width, --height, --n_in_row)")
+    if any(a.ponder for a in player_args):
+        parser.error("--ponder is only supported against a human (play.py)")
+    if args.processes > 1 and any(a.workers > 1 for a in player_args):
+        parser.error("players with --workers > 1 can only play with --processes 1")
+    run(args, player_args)
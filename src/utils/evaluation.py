@@ -1,6 +1,12 @@
 """
 Evaluation functions
+
+An evaluation function takes a state and outputs its value in the current player's perspective.
+The batch version of an evaluation function takes a list of states and outputs an array of their values,
+each in the perspective of the current player of the state.
 """
+import numpy as np
+from state import get_info_batch
 
 
 def dummy_evaluation_func(state):
@@ -18,35 +24,59 @@ def distance_evaluation_func(state):
             score += info_p["max_distance"]
     return score
 
+_DETAILED_SCORES = {
+    "live_four": 0.5,
+    "four": 0.05,
+    "live_three": 0.04,
+    "three": 0.025,
+    "live_two": 0.01,
+    "max_distance": -0.01,
+}
+
+
+def _detailed_score(info_p):
+    score = 0.0
+    for name, name_score in _DETAILED_SCORES.items():
+        score = score + info_p[name] * name_score
+    return score
+
+
 def detailed_evaluation_func(state):
     # TODO
-    live_four_score = 0.5
-    four_score = 0.05
-    live_three_score = 0.04
-    three_score = 0.025
-    live_two_score = 0.01
-    max_distance_score = 0.01
     player = state.get_current_player()
     info = state.get_info()
     score = 0.0
     for p, info_p in info.items():
         if p == player:
-            score += info_p["live_four"] * live_four_score + \
-                     info_p["four"] * four_score + \
-                     info_p["live_three"] * live_three_score + \
-                     info_p["three"] * three_score + \
-                     info_p["live_two"] * live_two_score - \
-                     info_p["max_distance"] * max_distance_score
+            score += _detailed_score(info_p)
         else:
-            score -= info_p["live_four"] * live_four_score + \
-                     info_p["four"] * four_score + \
-                     info_p["live_three"] * live_three_score + \
-                     info_p["three"] * three_score + \
-                     info_p["live_two"] * live_two_score -\
-                     info_p["max_distance"] * max_distance_score
+            score -= _detailed_score(info_p)
     return score
 
 
+def _get_info_batch(states):
+    """The info of the states as computed by get_info_batch, and the current player of each state"""
+    info = get_info_batch(np.stack([state.get_board_array() for state in states]))
+    players = np.array([state.get_current_player() for state in states])
+    return info, players
+
+
+def dummy_evaluation_func_batch(states):
+    return np.zeros(len(states))
+
+
+def distance_evaluation_func_batch(states):
+    info, players = _get_info_batch(states)
+    score = info[2]["max_distance"] - info[1]["max_distance"]
+    return np.where(players == 1, score, -score)
+
+
+def detailed_evaluation_func_batch(states):
+    info, players = _get_info_batch(states)
+    score = _detailed_score(info[1]) - _detailed_score(info[2])
+    return np.where(players == 1, score, -score)
+
+
 def get_evaluation_func(func_name):
     if func_name == "dummy_evaluation_func":
         return dummy_evaluation_func
@@ -56,3 +86,14 @@ def get_evaluation_func(func_name):
         return detailed_evaluation_func
     else:
         raise KeyError(func_name)
+
+
+def get_evaluation_func_batch(func_name):
+    if func_name == "dummy_evaluation_func":
+        return dummy_evaluation_func_batch
+    elif func_name == "distance_evaluation_func":
+        return distance_evaluation_func_batch
+    elif func_name == "detailed_evaluation_func":
+        return detailed_evaluation_func_batch
+    else:
+        raise KeyError(func_name)
@@ -0,0 +1,199 @@
+"""
+Binary game records
+
+A shard is an append-only file: a fixed header (magic, board size, n_in_row, flags), then the games one
+after the other. A game is a header (number of moves, first player, winner and number of visit entries),
+the moves as uint16, and with root visits, for every move the number of actions searched at the root,
+followed by all those actions (uint16) and their visit counts (uint32).
+
+Every game is written with one call, so a crash can only leave a truncated last game, which is ignored
+by the reader. The reader memory-maps the shards and only reads the headers of the games to index them.
+"""
+import bisect
+import os
+import numpy as np
+
+_MAGIC = b'GMKGAME1'
+_FILE_HEADER = np.dtype([('magic', 'S8'), ('width', '<u2'), ('height', '<u2'), ('n_in_row', '<u2'),
+                         ('flags', '<u2')])
+_GAME_HEADER = np.dtype([('n_moves', '<u2'), ('first', 'u1'), ('winner', 'u1'), ('n_entries', '<u4')])
+# the games of the shard have root visits
+_HAS_VISITS = 1
+
+
+class GameRecordWriter(object):
+    """Append games to a shard, creating it if it does not exist."""
+
+    def __init__(self, path, width, height, n_in_row, visits=False):
+        """
+        Parameters:
+            visits: store the root visits of every move.
+        """
+        self.path = path
+        self.visits = visits
+        header = np.array([(_MAGIC, width, height, n_in_row, _HAS_VISITS if visits else 0)], dtype=_FILE_HEADER)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            if np.fromfile(path, dtype=_FILE_HEADER, count=1)[0] != header[0]:
+                raise ValueError("{} holds games of another board or format".format(path))
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "ab")
+            self.file.write(header.tobytes())
+            self.file.flush()
+
+    def write(self, moves, first, winner, visits=None):
+        """
+        Append a game.
+
+        Parameters:
+            moves: the moves of the game.
+            first: the player making the first move (1 or 2).
+            winner: the winner, -1 for a tie.
+            visits: with root visits, for every move a Tuple(actions, n_visits) of the actions searched
+                at the root, or None for a move made without search.
+        """
+        parts = []
+        n_entries = 0
+        if self.visits:
+            visits = [(np.zeros(0), np.zeros(0)) if v is None else v for v in visits]
+            counts = np.array([len(actions) for actions, _ in visits], dtype='<u2')
+            n_entries = int(counts.sum())
+            parts = [counts.tobytes(),
+                     np.concatenate([actions for actions, _ in visits] + [[]]).astype('<u2').tobytes(),
+                     np.concatenate([n_visits for _, n_visits in visits] + [[]]).astype('<u4').tobytes()]
+        header = np.array([(len(moves), first, max(winner, 0), n_entries)], dtype=_GAME_HEADER)
+        self.file.write(b"".join([header.tobytes(), np.asarray(moves, dtype='<u2').tobytes()] + parts))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Position(object):
+    """
+    A position of a game record, before its move is played. The arrays are views of the shard.
+    """
+    __slots__ = ("reader", "game", "ply", "history", "move", "player", "winner", "visits")
+
+    def __init__(self, reader, game, ply, history, move, player, winner, visits):
+        self.reader = reader
+        # index of the game in the reader and number of moves before the position
+        self.game = game
+        self.ply = ply
+        # the moves before the position, the move played in it and the player making it
+        self.history = history
+        self.move = move
+        self.player = player
+        # winner of the game, -1 for a tie
+        self.winner = winner
+        # Tuple(actions, n_visits) of the root visits of the move, None without visits
+        self.visits = visits
+
+    def board(self):
+        """The board as an array of shape (height, width), 0 for empty cells"""
+        reader = self.reader
+        board = np.zeros((reader.height, reader.width), dtype=np.int8)
+        first = self.player if self.ply % 2 == 0 else 3 - self.player
+        board.flat[self.history[0::2]] = first
+        board.flat[self.history[1::2]] = 3 - first
+        return board
+
+    def state(self, board_class=None):
+        """
+        The position as a state, replaying the moves on a new board.
+
+        Parameters:
+            board_class: the class of the state, Board by default.
+        """
+        if board_class is None:
+            from state import Board as board_class
+        reader = self.reader
+        state = board_class(width=reader.width, height=reader.height, n_in_row=reader.n_in_row)
+        first = self.player if self.ply % 2 == 0 else 3 - self.player
+        state.reset(first - 1)
+        for move in self.history.tolist():
+            state.perform_action(move)
+        return state
+
+
+class GameRecordReader(object):
+    """
+    Read the games of one or more shards of the same board, memory-mapping them.
+    """
+
+    def __init__(self, paths):
+        self.shards = []
+        # offsets of the game headers of every shard, and the index of the first game of every shard
+        self.offsets = []
+        self.starts = [0]
+        for path in [paths] if isinstance(paths, str) else paths:
+            self._open(path)
+
+    def _open(self, path):
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        header = data[:_FILE_HEADER.itemsize].view(_FILE_HEADER)[0]
+        if header['magic'] != _MAGIC:
+            raise ValueError('{} is not a game record shard'.format(path))
+        shape = (int(header['width']), int(header['height']), int(header['n_in_row']))
+        if self.shards and shape != (self.width, self.height, self.n_in_row):
+            raise ValueError("{} holds games of another board".format(path))
+        self.width, self.height, self.n_in_row = shape
+        has_visits = bool(header['flags'] & _HAS_VISITS)
+        self.shards.append((data, has_visits))
+        offsets = []
+        offset = _FILE_HEADER.itemsize
+        while offset + _GAME_HEADER.itemsize <= len(data):
+            game = data[offset:offset + _GAME_HEADER.itemsize].view(_GAME_HEADER)[0]
+            n_moves, n_entries = int(game['n_moves']), int(game['n_entries'])
+            size = _GAME_HEADER.itemsize + 2 * n_moves
+            if has_visits:
+                size += 2 * n_moves + 6 * n_entries
+            if offset + size > len(data):
+                # truncated by an interrupted write
+                break
+            offsets.append(offset)
+            offset += size
+        self.offsets.append(np.array(offsets, dtype=np.int64))
+        self.starts.append(self.starts[-1] + len(offsets))
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def get_game(self, i):
+        """
+        Return:
+            Tuple(moves, first, winner, visits): the moves (as a view of the shard), the player making the
+            first move, the winner (-1 for a tie) and the list of the Tuple(actions, n_visits) of the moves
+            (None without visits).
+        """
+        shard = bisect.bisect_right(self.starts, i) - 1
+        offset = int(self.offsets[shard][i - self.starts[shard]])
+        data, has_visits = self.shards[shard]
+        game = data[offset:offset + _GAME_HEADER.itemsize].view(_GAME_HEADER)[0]
+        n_moves, n_entries = int(game['n_moves']), int(game['n_entries'])
+        offset += _GAME_HEADER.itemsize
+        moves = data[offset:offset + 2 * n_moves].view('<u2')
+        visits = None
+        if has_visits:
+            offset += 2 * n_moves
+            counts = data[offset:offset + 2 * n_moves].view('<u2')
+            offset += 2 * n_moves
+            actions = data[offset:offset + 2 * n_entries].view('<u2')
+            n_visits = data[offset + 2 * n_entries:offset + 6 * n_entries].view('<u4')
+            bounds = [0] + np.cumsum(counts, dtype=np.int64).tolist()
+            visits = [(actions[a:b], n_visits[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        winner = int(game['winner'])
+        return moves, int(game['first']), winner if winner else -1, visits
+
+    def games(self):
+        """Iterate over the games, as returned by get_game"""
+        for i in range(len(self)):
+            yield self.get_game(i)
+
+    def positions(self):
+        """Iterate over the positions of all games lazily, as Position objects"""
+        for i in range(len(self)):
+            moves, first, winner, visits = self.get_game(i)
+            for ply in range(len(moves)):
+                yield Position(self, i, ply, moves[:ply], int(moves[ply]), first if ply % 2 == 0 else 3 - first,
+                               winner, None if visits is None else visits[ply])
@@ -0,0 +1,97 @@
+"""
+Telemetry of the players
+
+The players keep the statistics of their last move in player.stats (see Player). The counters of the
+searches are kept unless they are switched off (Player.set_stats), while timing the evaluations needs a timer
+around every call, so it is only done with profiling on, by shadowing the timed methods for the duration of a search.
+"""
+import json
+import threading
+import time
+
+import numpy as np
+
+
+class Profile(object):
+    """
+    Context manager timing the calls of the methods names of obj while it is active. obj may be an instance,
+    a class (timing the method for all its instances) or a module (timing its functions). Each method is
+    shadowed by a timed wrapper and restored on exit, so nothing changes (and nothing is paid) when it is
+    disabled. Only the calls of the thread entering the context are timed, not those of pondering players.
+    The number of calls and their total time are kept in self.calls and self.time.
+    """
+
+    def __init__(self, obj, *names, enabled=True):
+        self.obj = obj
+        self.names = [name for name in names if hasattr(obj, name)]
+        self.enabled = enabled
+        self.calls = 0
+        self.time = 0.0
+        self._thread = None
+        self._saved = {}
+
+    def _timed(self, func):
+        def timed(*args, **kwargs):
+            if threading.get_ident() != self._thread:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.time += time.perf_counter() - start
+                self.calls += 1
+        return timed
+
+    def __enter__(self):
+        if self.enabled:
+            self._thread = threading.get_ident()
+            for name in self.names:
+                # the attribute defined on obj itself, restored on exit (None to delete the wrapper)
+                self._saved[name] = vars(self.obj).get(name)
+                setattr(self.obj, name, self._timed(getattr(self.obj, name)))
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            for name in self.names:
+                if self._saved[name] is None:
+                    delattr(self.obj, name)
+                else:
+                    setattr(self.obj, name, self._saved[name])
+        return False
+
+
+def _to_json(value):
+    # NumPy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+class StatsWriter(object):
+    """
+    Sink of the statistics of the moves of a game: one JSON object per move, appended to a JSONL file
+    and/or printed.
+    """
+
+    def __init__(self, path=None, echo=False):
+        """
+        Parameters:
+            path: JSONL file the records are appended to, None for no file.
+            echo: print the records too.
+        """
+        self.file = open(path, "a") if path is not None else None
+        self.echo = echo
+
+    def write(self, record):
+        line = json.dumps(record, default=_to_json)
+        if self.file is not None:
+            self.file.write(line + "\n")
+            self.file.flush()
+        if self.echo:
+            print(line)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
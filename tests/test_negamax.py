@@ -0,0 +1,64 @@
+"""
+Principal variation search against plain alpha-beta and minimax in NegamaxSearch, on fixed positions.
+"""
+import random
+
+import pytest
+from state import Board
+from search import NegamaxSearch, TranspositionTable, MoveOrderer
+from utils.evaluation import get_evaluation_func
+
+evaluation_func = get_evaluation_func("detailed_evaluation_func")
+
+
+def position(seed, width=7, height=7, n_in_row=4, n_moves=8):
+    """A position of n_moves random moves of a game not ended yet"""
+    rng = random.Random(seed)
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset(seed % 2)
+    for _ in range(n_moves):
+        state.perform_action(rng.choice(state.get_all_actions()))
+        if state.game_end()[0]:
+            state.cancel_action()
+            break
+    return state
+
+
+def search(state, depth, **kwargs):
+    board, player = state.get_board_array(), state.get_current_player()
+    value, line = NegamaxSearch(evaluation_func, **kwargs).search(state, depth)
+    # the actions are cancelled on the way back
+    assert (state.get_board_array() == board).all() and state.get_current_player() == player
+    assert line and line[0] in state.get_all_actions()
+    return value, line[0]
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3])
+@pytest.mark.parametrize("table", [False, True])
+@pytest.mark.parametrize("seed", range(4))
+def test_pvs_value_matches_alpha_beta(depth, table, seed):
+    state = position(seed)
+    values = []
+    for pvs in (True, False):
+        tt, orderer = (TranspositionTable(4), MoveOrderer()) if table else (None, None)
+        value, _ = search(state, depth, tt=tt, orderer=orderer, use_candidates=True, pvs=pvs)
+        values.append(value)
+    assert values[0] == pytest.approx(values[1])
+
+
+@pytest.mark.parametrize("depth", [1, 2])
+@pytest.mark.parametrize("seed", range(3))
+def test_pvs_value_matches_minimax(depth, seed):
+    state = position(seed, 5, 5, 4, 6)
+    value, _ = search(state, depth, pvs=True)
+    assert value == pytest.approx(search(state, depth, pruning=False)[0])
+
+
+@pytest.mark.parametrize("pvs", [False, True])
+def test_win_in_one(pvs):
+    # player 1 to move completes 0, 1, 2, 3
+    state = Board(width=6, height=6, n_in_row=4)
+    state.reset()
+    for move in (0, 30, 1, 31, 2, 35):
+        state.perform_action(move)
+    assert search(state, 2, pvs=pvs) == (1, 3)
@@ -0,0 +1,202 @@
+"""
+Randomized equivalence of the incremental pattern counts of Board.get_info with a full recount
+(compute_info, i.e. get_info_batch), along random walks of perform_action and cancel_action,
+and with the original scan of Board.get_info kept below as the reference.
+"""
+import random
+
+import numpy as np
+import pytest
+from state import Board, BitBoard, PATTERN_NAMES, get_info_batch, get_lines, line_pattern_counts
+
+# (width, height, n_in_row), square and non-square boards
+SIZES = [(6, 6, 4), (8, 5, 4), (5, 9, 4), (9, 9, 5), (11, 7, 5), (7, 12, 5), (15, 15, 5)]
+
+
+# the shapes of the original Board.get_info, in its order of the scan
+REFERENCE_SHAPES = {
+    "live_four": [
+        [0, 1, 1, 1, 1, 0],
+    ],
+    "four": [
+        [0, 1, 1, 1, 1],
+        [0, 1, 1, 1, 0, 1],
+        [0, 1, 1, 0, 1, 1],
+        [0, 1, 0, 1, 1, 1],
+        [1, 1, 1, 1, 0],
+        [1, 0, 1, 1, 1, 0],
+        [1, 1, 0, 1, 1, 0],
+        [1, 1, 1, 0, 1, 0],
+    ],
+    "live_three": [
+        [0, 1, 1, 1, 0],
+        [0, 1, 1, 0, 1, 0],
+        [0, 1, 0, 1, 1, 0],
+    ],
+    "three": [
+        [0, 1, 1, 1],
+        [0, 1, 1, 0, 1],
+        [0, 1, 0, 1, 1],
+        [1, 1, 1, 0],
+        [1, 1, 0, 1, 0],
+        [1, 0, 1, 1, 0],
+    ],
+    "live_two": [
+        [0, 1, 1, 0],
+        [0, 1, 0, 1, 0],
+    ],
+}
+
+
+def reference_info(state):
+    """
+    The info of state computed by the scan of the original Board.get_info.
+
+    The original filled an array of shape (width, height) at [move // width, move % height], which is the
+    board array for square boards only; the scan is run here on get_board_array() of shape (height, width),
+    so the same code also covers non-square boards. Cells out of the board are -1, and the cells of a
+    matched shape cannot be part of another shape of the same player in the same direction.
+    """
+    board = state.get_board_array().astype(float)
+    rows, cols = board.shape
+    all_state = -np.ones((4, 6, rows, cols))
+    for d in range(4):
+        all_state[d, 0] = board
+    for i in range(1, 6):
+        all_state[0, i, :-i, :] = board[i:, :]
+        all_state[1, i, :, :-i] = board[:, i:]
+        all_state[2, i, :-i, :-i] = board[i:, i:]
+        all_state[3, i, :-i, i:] = board[i:, :-i]
+
+    info = {}
+    for player in (1, 2):
+        info[player] = {}
+        occupied = np.zeros((4, 6, rows, cols), dtype=bool)
+        for shape_name, shape_list in REFERENCE_SHAPES.items():
+            info[player][shape_name] = 0
+            for shape in map(np.array, shape_list):
+                match = np.all(~occupied[:, :len(shape)]
+                               & (all_state[:, :len(shape)] == player * shape[None, :, None, None]), axis=1)
+                info[player][shape_name] += int(match.sum())
+                for d, r_0, c_0 in np.transpose(match.nonzero()):
+                    for j in range(len(shape)):
+                        r, c = [(r_0 + j, c_0), (r_0, c_0 + j), (r_0 + j, c_0 + j), (r_0 + j, c_0 - j)][d]
+                        for i in range(6):
+                            if d == 0 and r >= i:
+                                occupied[0, i, r - i, c] = 1
+                            if d == 1 and c >= i:
+                                occupied[1, i, r, c - i] = 1
+                            if d == 2 and r >= i and c >= i:
+                                occupied[2, i, r - i, c - i] = 1
+                            if d == 3 and r >= i and c + i < cols:
+                                occupied[3, i, r - i, c + i] = 1
+        locations = np.flatnonzero(board.ravel() == player)
+        max_distance = max([0.] + [abs(location // state.width - (state.height - 1) / 2)
+                                   + abs(location % state.width - (state.width - 1) / 2)
+                                   for location in locations])
+        info[player]["max_distance"] = max_distance / ((state.height - 1) / 2 + (state.width - 1) / 2)
+    return info
+
+
+def assert_same_info(info, expected):
+    for player in (1, 2):
+        for name in PATTERN_NAMES:
+            assert info[player][name] == expected[player][name], (player, name)
+        assert info[player]["max_distance"] == pytest.approx(expected[player]["max_distance"])
+
+
+def full_line_counts(state):
+    """The pattern counts of state summed over line_pattern_counts of every line, recounted from scratch"""
+    board = state.get_board_array().ravel()
+    totals = {1: np.zeros(len(PATTERN_NAMES), dtype=int), 2: np.zeros(len(PATTERN_NAMES), dtype=int)}
+    for line in get_lines(state.width, state.height):
+        counts = line_pattern_counts(bytes(b'012'[board[m]] for m in line))
+        for player in (1, 2):
+            totals[player] += counts[player - 1]
+    return {player: dict(zip(PATTERN_NAMES, totals[player].tolist())) for player in (1, 2)}
+
+
+def random_walk(state, rng, n_steps):
+    """Perform random actions (and cancel some of them) on state, yielding after each step"""
+    for _ in range(n_steps):
+        if state.can_cancel and (not state.get_all_actions() or rng.random() < 0.3):
+            state.cancel_action()
+        else:
+            state.perform_action(rng.choice(state.get_all_actions()))
+        yield
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_info_matches_full_recount(width, height, n_in_row, seed):
+    rng = random.Random(seed)
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset(seed % 2)
+    for step in random_walk(state, rng, 2 * width * height):
+        info = state.get_info()
+        assert_same_info(info, state.compute_info())
+        if rng.random() < 0.1:
+            # the line counts are only brought up to date by get_info, so the counts of a clone
+            # taken between two calls must follow its own moves
+            clone = state.clone()
+            if clone.get_all_actions():
+                clone.perform_action(rng.choice(clone.get_all_actions()))
+            assert_same_info(clone.get_info(), clone.compute_info())
+            assert_same_info(state.get_info(), info)
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+@pytest.mark.parametrize("seed", range(2))
+def test_info_matches_original_scan(width, height, n_in_row, seed):
+    rng = random.Random(100 + seed)
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset(seed)
+    for i, _ in enumerate(random_walk(state, rng, 2 * width * height)):
+        if i % 3 == 0:
+            assert_same_info(state.get_info(), reference_info(state))
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+def test_info_after_several_steps_without_get_info(width, height, n_in_row):
+    # lines changed several times (and back) between two calls of get_info
+    rng = random.Random(width * height)
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset()
+    for i, _ in enumerate(random_walk(state, rng, 3 * width * height)):
+        if i % 7 == 0:
+            assert_same_info(state.get_info(), state.compute_info())
+
+
+@pytest.mark.parametrize("width,height,n_in_row", [(6, 6, 4), (11, 7, 5), (5, 9, 4)])
+def test_batch_and_line_counts_agree(width, height, n_in_row):
+    rng = random.Random(1)
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset()
+    boards, infos = [], []
+    for _ in random_walk(state, rng, width * height):
+        boards.append(state.get_board_array())
+        infos.append(state.get_info())
+        counts = full_line_counts(state)
+        for player in (1, 2):
+            for name in PATTERN_NAMES:
+                assert infos[-1][player][name] == counts[player][name]
+    batch = get_info_batch(np.stack(boards))
+    for i, info in enumerate(infos):
+        for player in (1, 2):
+            for name in PATTERN_NAMES:
+                assert batch[player][name][i] == info[player][name]
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+def test_bitboard_info_matches_board(width, height, n_in_row):
+    rng = random.Random(2)
+    board = Board(width=width, height=height, n_in_row=n_in_row)
+    bitboard = BitBoard(width=width, height=height, n_in_row=n_in_row)
+    board.reset()
+    bitboard.reset()
+    for _ in range(width * height // 2):
+        action = rng.choice(board.get_all_actions())
+        board.perform_action(action)
+        bitboard.perform_action(action)
+        assert (bitboard.get_board_array() == board.get_board_array()).all()
+        assert_same_info(bitboard.get_info(), board.get_info())
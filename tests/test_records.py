@@ -0,0 +1,127 @@
+"""
+Round trips of games through the binary shards of GameRecordWriter and GameRecordReader.
+"""
+import random
+
+import numpy as np
+import pytest
+from state import Board
+from utils.records import GameRecordWriter, GameRecordReader
+
+# a non-square board small enough for ties
+WIDTH, HEIGHT, N_IN_ROW = 5, 4, 4
+
+
+def random_game(rng, visits=False):
+    """Tuple(moves, first, winner, visits, states) of a random game, states being the state before each move"""
+    state = Board(width=WIDTH, height=HEIGHT, n_in_row=N_IN_ROW)
+    first = rng.choice((1, 2))
+    state.reset(first - 1)
+    moves, states, game_visits = [], [], []
+    while not state.game_end()[0]:
+        states.append(state.clone())
+        move = rng.choice(state.get_all_actions())
+        if rng.random() < 0.2:
+            # a move made without search
+            game_visits.append(None)
+        else:
+            actions = np.array(rng.sample(state.get_all_actions(), min(5, len(state.get_all_actions()))))
+            game_visits.append((actions, np.array([rng.randrange(1 << 20) for _ in actions])))
+        state.perform_action(move)
+        moves.append(move)
+    return moves, first, state.game_end()[1], game_visits if visits else None, states
+
+
+def write_games(path, games, visits):
+    writer = GameRecordWriter(str(path), WIDTH, HEIGHT, N_IN_ROW, visits=visits)
+    for moves, first, winner, game_visits, _ in games:
+        writer.write(moves, first, winner, game_visits)
+    writer.close()
+
+
+def assert_same_visits(read, written):
+    if written is None:
+        assert len(read[0]) == len(read[1]) == 0
+    else:
+        assert read[0].tolist() == written[0].tolist()
+        assert read[1].tolist() == written[1].tolist()
+
+
+@pytest.mark.parametrize("visits", [False, True])
+def test_round_trip(tmp_path, visits):
+    rng = random.Random(0)
+    games = [random_game(rng, visits) for _ in range(10)]
+    path = tmp_path / "games.bin"
+    write_games(path, games[:6], visits)
+    # reopening appends to the shard
+    write_games(path, games[6:], visits)
+
+    reader = GameRecordReader(str(path))
+    assert (reader.width, reader.height, reader.n_in_row) == (WIDTH, HEIGHT, N_IN_ROW)
+    assert len(reader) == len(games)
+    assert {winner for _, _, winner, _, _ in games} == {-1, 1, 2}
+    for (moves, first, winner, game_visits, _), read in zip(games, reader.games()):
+        assert read[0].tolist() == moves
+        assert read[1:3] == (first, winner)
+        if visits:
+            assert len(read[3]) == len(moves)
+            for read_visits, written in zip(read[3], game_visits):
+                assert_same_visits(read_visits, written)
+        else:
+            assert read[3] is None
+
+    positions = list(reader.positions())
+    expected = [(i, ply, move, state, winner, None if game_visits is None else game_visits[ply])
+                for i, (moves, _, winner, game_visits, states) in enumerate(games)
+                for ply, (move, state) in enumerate(zip(moves, states))]
+    assert len(positions) == len(expected)
+    for position, (i, ply, move, state, winner, move_visits) in zip(positions, expected):
+        assert (position.game, position.ply, position.move, position.winner) == (i, ply, move, winner)
+        assert position.player == state.get_current_player()
+        assert (position.board() == state.get_board_array()).all()
+        replayed = position.state()
+        assert (replayed.get_board_array() == state.get_board_array()).all()
+        assert replayed.get_current_player() == state.get_current_player()
+        assert replayed.get_hash() == state.get_hash()
+        if visits:
+            assert_same_visits(position.visits, move_visits)
+        else:
+            assert position.visits is None
+
+
+def test_truncated_last_game_is_ignored(tmp_path):
+    rng = random.Random(1)
+    games = [random_game(rng, True) for _ in range(3)]
+    path = tmp_path / "games.bin"
+    write_games(path, games, True)
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    reader = GameRecordReader(str(path))
+    assert len(reader) == 2
+    assert [game[0].tolist() for game in reader.games()] == [games[0][0], games[1][0]]
+
+
+def test_reader_of_several_shards(tmp_path):
+    rng = random.Random(2)
+    games = [random_game(rng) for _ in range(5)]
+    write_games(tmp_path / "a.bin", games[:2], False)
+    write_games(tmp_path / "b.bin", games[2:], False)
+    reader = GameRecordReader([str(tmp_path / "a.bin"), str(tmp_path / "b.bin")])
+    assert len(reader) == 5
+    assert [reader.get_game(i)[0].tolist() for i in range(5)] == [game[0] for game in games]
+
+
+@pytest.mark.parametrize("shape,visits", [((9, 9, 5), False), ((WIDTH, HEIGHT, 5), False),
+                                          ((HEIGHT, WIDTH, N_IN_ROW), False), ((WIDTH, HEIGHT, N_IN_ROW), True)])
+def test_reopen_with_another_board_or_format(tmp_path, shape, visits):
+    path = tmp_path / "games.bin"
+    write_games(path, [random_game(random.Random(3))], False)
+    data = path.read_bytes()
+    with pytest.raises(ValueError, match="another board or format"):
+        GameRecordWriter(str(path), *shape, visits=visits)
+    assert path.read_bytes() == data
+    other = tmp_path / "other.bin"
+    GameRecordWriter(str(other), *shape, visits=visits).close()
+    if shape != (WIDTH, HEIGHT, N_IN_ROW):
+        with pytest.raises(ValueError, match="another board"):
+            GameRecordReader([str(path), str(other)])
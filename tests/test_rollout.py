@@ -0,0 +1,186 @@
+"""
+The rollouts of RolloutEngine against games replayed move by move on a Board, from empty and pre-filled boards.
+"""
+import random
+
+import numpy as np
+import pytest
+from state import Board, get_lines
+from search import RolloutEngine
+
+# (width, height, n_in_row), the boards of up to 24 cells end in ties often
+SIZES = [(4, 4, 4), (5, 4, 4), (4, 6, 4), (6, 6, 4), (9, 7, 5)]
+
+
+def random_position(rng, width, height, n_in_row):
+    """A position of a random number of random moves (possibly none) of a game not ended yet"""
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset(rng.randrange(2))
+    for _ in range(rng.randrange(width * height // 2)):
+        state.perform_action(rng.choice(state.get_all_actions()))
+        if state.game_end()[0]:
+            state.cancel_action()
+            break
+    return state
+
+
+def random_order(rng, state):
+    """The empty cells of state in a random order"""
+    order = list(state.get_all_actions())
+    rng.shuffle(order)
+    return order
+
+
+def win_cells(state, player):
+    """The empty cells completing n_in_row for player"""
+    board = state.get_board_array().ravel()
+    cells = set()
+    for line in get_lines(state.width, state.height):
+        for i in range(len(line) - state.n_in_row + 1):
+            window = [board[m] for m in line[i:i + state.n_in_row]]
+            if window.count(player) == state.n_in_row - 1 and window.count(0) == 1:
+                cells.add(line[i + window.index(0)])
+    return cells
+
+
+def replay(state, order):
+    """The winner of the game playing order from state, -1 for a tie"""
+    state = state.clone()
+    for move in order:
+        state.perform_action(move)
+        end, winner = state.game_end()
+        if end:
+            return winner
+    return state.game_end()[1]
+
+
+def heuristic_replay(state, order):
+    """The winner of the game from state where each player wins or blocks when it can, and plays order otherwise"""
+    state = state.clone()
+    while not state.game_end()[0]:
+        player = state.get_current_player()
+        if win_cells(state, player):
+            return player
+        blocks = win_cells(state, 3 - player)
+        move = min(blocks) if blocks else next(m for m in order if m in state.get_all_actions())
+        state.perform_action(move)
+    return state.game_end()[1]
+
+
+def engine_args(state):
+    board = state.get_board_array()
+    height, width = board.shape
+    return board.ravel(), width, height, state.n_in_row, state.get_current_player()
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+def test_random_rollout_matches_replay(width, height, n_in_row):
+    rng = random.Random(width * height)
+    winners = set()
+    for _ in range(100):
+        state = random_position(rng, width, height, n_in_row)
+        order = random_order(rng, state)
+        board, width, height, n, player = engine_args(state)
+        winner = RolloutEngine._random_rollout(board, np.array(order), width, height, n, player)
+        assert winner == replay(state, order)
+        winners.add(winner)
+    if width * height <= 24:
+        assert winners == {-1, 1, 2}
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+def test_heuristic_rollout_matches_replay(width, height, n_in_row):
+    rng = random.Random(width * height)
+    engine = RolloutEngine(heuristic=True)
+    winners = set()
+    for _ in range(50):
+        state = random_position(rng, width, height, n_in_row)
+        order = random_order(rng, state)
+        board, width, height, n, player = engine_args(state)
+        winner = engine._heuristic_rollout(bytearray(board.tobytes()), order, width, height, n, player)
+        assert winner == heuristic_replay(state, order)
+        winners.add(winner)
+    if width * height <= 24:
+        assert -1 in winners
+
+
+def test_heuristic_rollout_wins_when_it_can():
+    # player 1 to move has three in a row, whatever the order of the other moves
+    state = Board(width=6, height=6, n_in_row=4)
+    state.reset()
+    for move in (0, 30, 1, 31, 2, 35):
+        state.perform_action(move)
+    engine = RolloutEngine(heuristic=True)
+    assert all(engine.rollout(state) == 1 for _ in range(50))
+    # as well as player 2 when both have a winning cell
+    state.cancel_action()
+    state.perform_action(32)
+    state.perform_action(14)
+    assert all(engine.rollout(state) == 2 for _ in range(50))
+
+
+def test_heuristic_rollout_blocks_when_it_cannot_win():
+    # player 2 to move has no winning cell and blocks the one of player 1 at 3
+    state = Board(width=6, height=6, n_in_row=4)
+    state.reset()
+    for move in (0, 35, 1, 28, 2):
+        state.perform_action(move)
+    rng = random.Random(0)
+    engine = RolloutEngine(heuristic=True)
+    board, width, height, n, player = engine_args(state)
+    for _ in range(50):
+        cells = bytearray(board.tobytes())
+        engine._heuristic_rollout(cells, random_order(rng, state), width, height, n, player)
+        assert cells[3] == 2
+
+
+@pytest.mark.parametrize("heuristic", [False, True])
+def test_rollout_of_an_ended_game(heuristic):
+    state = Board(width=6, height=6, n_in_row=4)
+    state.reset()
+    for move in (0, 30, 1, 31, 2, 32, 3):
+        state.perform_action(move)
+    assert RolloutEngine(heuristic).rollout(state) == 1
+
+
+@pytest.mark.parametrize("width,height,n_in_row", SIZES)
+def test_random_rollouts_match_replay(width, height, n_in_row):
+    rng = random.Random(width + height)
+    for _ in range(10):
+        state = random_position(rng, width, height, n_in_row)
+        orders = [random_order(rng, state) for _ in range(20)]
+        board, width, height, n, player = engine_args(state)
+        winners = RolloutEngine._random_rollouts(board, np.array(orders), width, height, n, player)
+        assert winners.tolist() == [replay(state, order) for order in orders]
+
+
+@pytest.mark.parametrize("heuristic", [False, True])
+@pytest.mark.parametrize("n_games", [1, 2, 16])
+def test_rollout_batch_matches_replay(heuristic, n_games):
+    rng = random.Random(n_games)
+    engine = RolloutEngine(heuristic)
+    for seed in range(20):
+        state = random_position(rng, 5, 4, 4)
+        board = state.get_board_array()
+        # the orders drawn by rollout_batch, from a generator in the same state as the one of the engine
+        engine._rng = np.random.default_rng(seed)
+        orders_rng = np.random.default_rng(seed)
+        empty = np.flatnonzero(board.ravel() == 0)
+        if n_games == 1:
+            orders = [orders_rng.permutation(empty).tolist()]
+        else:
+            orders = orders_rng.permuted(np.broadcast_to(empty, (n_games, len(empty))), axis=1).tolist()
+        winners = engine.rollout_batch(state, n_games)
+        assert winners.shape == (n_games,)
+        expected = [(heuristic_replay if heuristic else replay)(state, order) for order in orders]
+        assert winners.tolist() == expected
+        assert (state.get_board_array() == board).all()
+
+
+@pytest.mark.parametrize("n_games", [1, 8])
+def test_rollout_batch_of_an_ended_game(n_games):
+    state = Board(width=6, height=6, n_in_row=4)
+    state.reset()
+    for move in (0, 30, 1, 31, 2, 32, 3):
+        state.perform_action(move)
+    assert RolloutEngine().rollout_batch(state, n_games).tolist() == [1] * n_games
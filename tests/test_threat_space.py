@@ -0,0 +1,97 @@
+"""
+ThreatSpaceSearch against a full NegamaxSearch on small boards, and the order of its results.
+"""
+import random
+
+import pytest
+from state import Board
+from search import ThreatSpaceSearch, NegamaxSearch, TranspositionTable
+
+
+def random_position(seed, width=6, height=6, n_in_row=4):
+    """A position of 6 to 15 random moves of a game not ended yet"""
+    rng = random.Random(seed)
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset(seed % 2)
+    for _ in range(rng.randrange(6, 16)):
+        state.perform_action(rng.choice(state.get_all_actions()))
+        if state.game_end()[0]:
+            state.cancel_action()
+            break
+    return state
+
+
+def play(moves, width=6, height=6, n_in_row=4):
+    """A position of moves played in turn by the players, player 1 first"""
+    state = Board(width=width, height=height, n_in_row=n_in_row)
+    state.reset()
+    for move in moves:
+        state.perform_action(move)
+    return state
+
+
+def test_proven_wins_are_wins_of_negamax():
+    # a win found with at most max_depth threats is won within 2 * max_depth plies after its first move
+    max_depth = 2
+    kinds = set()
+    for seed in range(120):
+        state = random_position(seed)
+        board = state.get_board_array()
+        tss = ThreatSpaceSearch(max_nodes=100000, max_depth=max_depth)
+        move = tss.solve(state)
+        assert (state.get_board_array() == board).all()
+        if tss.result not in ("vcf", "vct"):
+            continue
+        kinds.add(tss.result)
+        assert move in state.get_all_actions()
+        state.perform_action(move)
+        value, _ = NegamaxSearch(tt=TranspositionTable(4)).search(state, 2 * max_depth, -1, -0.5)
+        # the opponent loses against every defence
+        assert value == -1, (seed, tss.result, move)
+    assert kinds == {"vcf", "vct"}
+
+
+def test_vcf_only_searches_fours():
+    for seed in range(120):
+        state = random_position(seed)
+        vct = ThreatSpaceSearch(max_nodes=100000, max_depth=2)
+        vcf = ThreatSpaceSearch(max_nodes=100000, max_depth=2, use_threes=False)
+        vcf_move, vct_move = vcf.solve(state), vct.solve(state)
+        assert vcf.result in (None, "win", "block", "vcf"), seed
+        # sequences of fours are searched first by both
+        if vct.result in ("win", "block", "vcf"):
+            assert (vcf.result, vcf_move) == (vct.result, vct_move), seed
+
+
+def test_win_before_block():
+    # both players have three in a row, player 1 to move
+    state = play([0, 30, 1, 31, 2, 32])
+    tss = ThreatSpaceSearch()
+    assert tss.solve(state) == 3
+    assert tss.result == "win"
+
+
+def test_block_before_threats():
+    # player 2 wins at 33, player 1 could make fours from 0, 1 and 14
+    state = play([0, 30, 1, 31, 14, 32])
+    tss = ThreatSpaceSearch()
+    assert tss.solve(state) == 33
+    assert tss.result == "block"
+    # without the threat of player 2, player 1 has a forcing sequence
+    state = play([0, 30, 1, 35, 14, 32])
+    assert tss.solve(state) is not None
+    assert tss.result in ("vcf", "vct")
+
+
+@pytest.mark.parametrize("max_nodes", [0, 1])
+def test_budget_exceeded_returns_none(max_nodes):
+    # a position with a forcing sequence but no immediate win or block, which are found without a search
+    tss = ThreatSpaceSearch(max_nodes=100000)
+    state = next(s for s in map(random_position, range(120)) if tss.solve(s) is not None
+                 and tss.result in ("vcf", "vct"))
+    board = state.get_board_array()
+    tss = ThreatSpaceSearch(max_nodes=max_nodes)
+    assert tss.solve(state) is None
+    assert tss.result is None
+    assert tss.nodes == max_nodes + 1
+    assert (state.get_board_array() == board).all()